@@ -0,0 +1,104 @@
+import re
+from typing import Dict, Any, List, Tuple
+
+
+def plan_segments(duration: float, silences: List[Tuple[float, float]], segment_seconds: float = 120,
+                  overlap_seconds: float = 2, search_window: float = 15,
+                  min_tail_seconds: float = None) -> List[Dict[str, Any]]:
+    """
+    Split a recording into segments of roughly segment_seconds.
+
+    Each cut is moved to the middle of the nearest silence within search_window
+    seconds of the target when there is one. A remainder shorter than
+    min_tail_seconds (a quarter segment by default) is merged into the segment
+    before it rather than costing a call of its own. Segments are then widened
+    by overlap_seconds on both sides of every cut so no words are lost at the seams.
+    """
+    if min_tail_seconds is None:
+        min_tail_seconds = segment_seconds / 4
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+
+    cuts = []
+    position = 0.0
+    while duration - position > segment_seconds:
+        target = position + segment_seconds
+        candidates = [
+            m for m in midpoints
+            if abs(m - target) <= search_window and m - position > segment_seconds / 2
+        ]
+        if candidates:
+            cuts.append((min(candidates, key=lambda m: abs(m - target)), True))
+        else:
+            cuts.append((target, False))
+        position = cuts[-1][0]
+    if cuts and duration - cuts[-1][0] < min_tail_seconds:
+        cuts.pop()
+
+    boundaries = [(0.0, False)] + cuts + [(duration, False)]
+    segments = []
+    for i in range(len(boundaries) - 1):
+        start, start_at_silence = boundaries[i]
+        end, end_at_silence = boundaries[i + 1]
+        segments.append({
+            "index": i,
+            "start": max(0.0, start - overlap_seconds) if i > 0 else 0.0,
+            "end": min(duration, end + overlap_seconds) if i < len(boundaries) - 2 else duration,
+            "cut_at_silence": end_at_silence
+        })
+    return segments
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def _tokens(text: str) -> List[Tuple[str, str]]:
+    """
+    Words of text, each paired with the break that follows it: a space, a
+    newline or a paragraph break
+    """
+    tokens = []
+    for match in re.finditer(r"(\S+)(\s*)", text):
+        gap = match.group(2)
+        tokens.append((match.group(1), "\n\n" if gap.count("\n") > 1 else "\n" if "\n" in gap else " "))
+    return tokens
+
+
+def _overlap_length(previous: List[str], following: List[str], max_words: int, min_words: int) -> int:
+    """Length of the longest run of words that ends previous and starts following"""
+    prev_norm = [_normalize_word(w) for w in previous[-max_words:]]
+    next_norm = [_normalize_word(w) for w in following[:max_words]]
+    for n in range(min(len(prev_norm), len(next_norm)), min_words - 1, -1):
+        if prev_norm[-n:] == next_norm[:n]:
+            return n
+    return 0
+
+
+def stitch_transcripts(texts: List[str], max_overlap_words: int = 40, min_overlap_words: int = 3) -> str:
+    """
+    Join per-segment transcripts in order, dropping the words each segment
+    repeats from the end of the previous one because of the overlap. Line and
+    paragraph breaks within segments are kept.
+    """
+    tokens: List[Tuple[str, str]] = []
+    for text in texts:
+        following = _tokens(text or "")
+        if not following:
+            continue
+        overlap = _overlap_length(
+            [word for word, _ in tokens[-max_overlap_words:]], [word for word, _ in following],
+            max_overlap_words, min_overlap_words
+        )
+        if tokens:
+            # The seam keeps the break that followed the last repeated word
+            tokens[-1] = (tokens[-1][0], following[overlap - 1][1] if overlap else " ")
+        tokens.extend(following[overlap:])
+    if not tokens:
+        return ""
+    return "".join(word + gap for word, gap in tokens[:-1]) + tokens[-1][0]
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as HH:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
@@ -0,0 +1,69 @@
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+# Generated files that are never rewritten under the same URL
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Files that may be re-rendered in place: always revalidate with the ETag
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """
+    Strong ETag for a file on disk. Generated files are swapped in with
+    os.replace, so a new rendering always gets a new inode or mtime.
+    """
+    return f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    # If-Modified-Since only counts when no If-None-Match was sent
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cacheable_file_response(request: Request, path: str, media_type: str, filename: str,
+                            cache_control: str = IMMUTABLE_CACHE_CONTROL) -> Response:
+    """
+    Serve a file with a strong ETag, Last-Modified and Cache-Control.
+
+    Conditional GETs that still match get an empty 304. Everything else goes
+    through FileResponse, which streams the file in chunks (or hands it to the
+    server's sendfile support) and answers Range / If-Range requests.
+    Raises FileNotFoundError if path does not exist.
+    """
+    stat_result = os.stat(path)
+    etag = file_etag(stat_result)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+
+    if request.method in ("GET", "HEAD") and _not_modified(request, etag, stat_result):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        headers=headers,
+        stat_result=stat_result
+    )
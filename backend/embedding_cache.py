@@ -0,0 +1,198 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+
+load_dotenv()
+
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache")
+os.makedirs(cache_dir, exist_ok=True)
+
+# Least recently used vectors are dropped once the cache holds more than this
+# (100k text-embedding-3-small vectors take about 600 MB)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of whitespace so trivially different copies share a vector"""
+    return " ".join(text.split())
+
+
+def make_embedding_cache_key(model: str, kind: str, text: str) -> str:
+    # Query and document embeddings differ for some models, so they are keyed apart
+    return hashlib.sha256(f"{model}\0{kind}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent SQLite cache of embedding vectors, stored as float32 blobs and
+    keyed by model name, embedding kind and normalized text hash.
+    """
+
+    def __init__(self, db_path: str = os.path.join(cache_dir, "embeddings.db"),
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_accessed ON embeddings(last_accessed)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, cache_keys: List[str]) -> List[Optional[List[float]]]:
+        """Look up vectors for cache_keys; missing ones come back as None"""
+        if not cache_keys:
+            return []
+        found = {}
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            unique_keys = list(dict.fromkeys(cache_keys))
+            # Stay well below SQLite's limit on bound parameters
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for cache_key, vector in conn.execute(
+                    f"SELECT cache_key, vector FROM embeddings WHERE cache_key IN ({placeholders})", chunk
+                ):
+                    found[cache_key] = np.frombuffer(vector, dtype=np.float32).tolist()
+                if found:
+                    conn.execute(
+                        f"UPDATE embeddings SET last_accessed = ? WHERE cache_key IN ({placeholders})",
+                        [now] + chunk
+                    )
+            hits = sum(1 for cache_key in cache_keys if cache_key in found)
+            self._hits += hits
+            self._misses += len(cache_keys) - hits
+        return [found.get(cache_key) for cache_key in cache_keys]
+
+    def put_many(self, model: str, cache_keys: List[str], vectors: List[List[float]]):
+        if not cache_keys:
+            return
+        now = time.time()
+        rows = [
+            (cache_key, model, np.asarray(vector, dtype=np.float32).tobytes(), now, now)
+            for cache_key, vector in zip(cache_keys, vectors)
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            overflow = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    """
+                    DELETE FROM embeddings WHERE cache_key IN (
+                        SELECT cache_key FROM embeddings ORDER BY last_accessed ASC LIMIT ?
+                    )
+                    """,
+                    (overflow,)
+                )
+                self._evictions += overflow
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock, self._connect() as conn:
+            entries, total_size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+        lookups = self._hits + self._misses
+        return {
+            "entries": entries,
+            "total_bytes": total_size,
+            "max_entries": self.max_entries,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else None
+        }
+
+
+embedding_cache = EmbeddingCache()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model wrapper that serves repeated texts and queries from the
+    embedding cache and only sends the misses to the wrapped model.
+    """
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache: EmbeddingCache = None, **kwargs: Any):
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+        self._inner = inner
+        self._cache = cache or embedding_cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _lookup(self, kind: str, texts: List[str]):
+        keys = [make_embedding_cache_key(self.model_name, kind, text) for text in texts]
+        vectors = self._cache.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        return keys, vectors, missing
+
+    def _store(self, keys, vectors, missing, computed):
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+        self._cache.put_many(self.model_name, [keys[i] for i in missing], computed)
+        return vectors
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        keys, vectors, missing = self._lookup("query", [query])
+        if missing:
+            return self._store(keys, vectors, missing, [self._inner._get_query_embedding(query)])[0]
+        return vectors[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        keys, vectors, missing = self._lookup("query", [query])
+        if missing:
+            return self._store(keys, vectors, missing, [await self._inner._aget_query_embedding(query)])[0]
+        return vectors[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup("text", texts)
+        if missing:
+            computed = self._inner._get_text_embeddings([texts[i] for i in missing])
+            return self._store(keys, vectors, missing, computed)
+        return vectors
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup("text", texts)
+        if missing:
+            computed = await self._inner._aget_text_embeddings([texts[i] for i in missing])
+            return self._store(keys, vectors, missing, computed)
+        return vectors
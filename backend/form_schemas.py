@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+schemas_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "forms")
+os.makedirs(schemas_dir, exist_ok=True)
+
+# Where a schema came from: extracted by the workflow, or registered by an operator
+SOURCE_EXTRACTED = "extracted"
+SOURCE_OPERATOR = "operator"
+
+
+class FormSchemaRegistry:
+    """
+    SQLite registry of the fields to fill in for each blank form, keyed by the
+    form file's content hash.
+
+    The workflow records the fields it extracts from a form it has not seen
+    before. Schemas registered by an operator take precedence and are never
+    overwritten by extraction.
+    """
+
+    def __init__(self, db_path: str = os.path.join(schemas_dir, "schemas.db")):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS form_schemas (
+                    content_hash TEXT PRIMARY KEY,
+                    name TEXT,
+                    fields TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        item = dict(row)
+        item["fields"] = json.loads(item["fields"])
+        return item
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM form_schemas WHERE content_hash = ?", (content_hash,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def lookup(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Like get, but counted in the hit/miss stats; used by the workflow"""
+        schema = self.get(content_hash)
+        with self._lock:
+            if schema is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return schema
+
+    def register(self, content_hash: str, fields: List[str], source: str = SOURCE_OPERATOR, name: str = None):
+        """
+        Store the fields of a form. Operator schemas replace whatever is stored;
+        extracted schemas are only stored if there is none yet.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            if source == SOURCE_OPERATOR:
+                conn.execute(
+                    "INSERT INTO form_schemas (content_hash, name, fields, source, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(content_hash) DO UPDATE SET "
+                    "name = COALESCE(excluded.name, name), fields = excluded.fields, "
+                    "source = excluded.source, updated_at = excluded.updated_at",
+                    (content_hash, name, json.dumps(fields), source, now, now)
+                )
+            else:
+                conn.execute(
+                    "INSERT OR IGNORE INTO form_schemas (content_hash, name, fields, source, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (content_hash, name, json.dumps(fields), source, now, now)
+                )
+
+    def delete(self, content_hash: str) -> bool:
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM form_schemas WHERE content_hash = ?", (content_hash,)).rowcount > 0
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM form_schemas ORDER BY updated_at DESC").fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else None
+        }
+
+
+form_schema_registry = FormSchemaRegistry()
@@ -1,19 +1,27 @@
 import google.genai as genai
 from google.genai.types import Part
 from dotenv import load_dotenv
+import asyncio
+import hashlib
 import os
 import time
 import uuid
-import subprocess
-from fastapi import APIRouter, UploadFile, File, Request
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
+from fastapi import APIRouter, UploadFile, File, Form, Query, Request
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from typing import Dict, Any
 import json
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.units import inch
+from collections import Counter
+from pdf_renderer import PDFRenderQueueFull
+from downloads import cacheable_file_response, REVALIDATE_CACHE_CONTROL
+from transcoder import transcode_pool, TranscodeQueueFull, probe_media, choose_conversion_path, detect_silences
+from chunking import plan_segments, stitch_transcripts, format_timestamp
+from jobs import job_store, job_runner, JobQueueFull, TERMINAL_STATUSES
+from transcription_cache import transcription_cache, make_cache_key
+from transcription_store import transcription_store
+from transcription_pdfs import (
+    transcriptions_dir, transcription_pdf_path, transcription_id_from_filename, ensure_transcription_pdf
+)
 
 load_dotenv()
 
@@ -25,53 +33,179 @@ os.makedirs(videos_dir, exist_ok=True)
 analysis_dir = os.path.join(videos_dir, "analysis")
 os.makedirs(analysis_dir, exist_ok=True)
 
-# Add transcription directory
-transcriptions_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "transcriptions")
-os.makedirs(transcriptions_dir, exist_ok=True)
+# Register PDFs saved before the structured store existed
+transcription_store.backfill_legacy(transcriptions_dir)
 
 router = APIRouter()
 client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
-@router.post("/analyze-video")
-async def analyze_video(video: UploadFile = File(...)) -> Dict[str, Any]:
+GEMINI_MODEL = "gemini-2.0-flash-001"
+
+# Uploads are copied to disk in chunks of this size in streaming mode
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# "buffered" reads the upload into memory, "stream" spools it to disk so
+# only media small enough to send inline is ever read back
+INGEST_MODES = ("buffered", "stream")
+VIDEO_INGEST_MODE = os.getenv("VIDEO_INGEST_MODE", "buffered")
+
+# Media larger than this is uploaded through the Gemini Files API instead of
+# being inlined in the request (inline requests are capped at 20 MB)
+GEMINI_INLINE_MAX_BYTES = int(os.getenv("GEMINI_INLINE_MAX_BYTES", str(15 * 1024 * 1024)))
+
+# "video" sends the whole recording, "audio" sends only the extracted speech track,
+# "long" splits the speech track into segments transcribed in parallel
+TRANSCRIPTION_MODES = ("video", "audio", "long")
+TRANSCRIPTION_MODE = os.getenv("TRANSCRIPTION_MODE", "video")
+
+# How often the job event stream checks for updates
+JOB_EVENTS_POLL_INTERVAL = float(os.getenv("JOB_EVENTS_POLL_INTERVAL", "0.5"))
+
+# Segmenting for long recordings
+LONG_MEDIA_SEGMENT_SECONDS = float(os.getenv("LONG_MEDIA_SEGMENT_SECONDS", "120"))
+LONG_MEDIA_OVERLAP_SECONDS = float(os.getenv("LONG_MEDIA_OVERLAP_SECONDS", "2"))
+LONG_MEDIA_CONCURRENCY = int(os.getenv("LONG_MEDIA_CONCURRENCY", "4"))
+LONG_MEDIA_SEGMENT_RETRIES = int(os.getenv("LONG_MEDIA_SEGMENT_RETRIES", "2"))
+
+# How many uploads took each conversion path since startup
+conversion_path_counts = Counter()
+
+def _transcription_prompt(media_kind: str = "video") -> str:
+    """Build the transcription prompt for a video or audio-only upload"""
+    subject = "this video" if media_kind == "video" else "this audio recording"
+    return (
+        f"Provide a complete transcript of what the person is saying in {subject}.\n"
+        "Focus exclusively on the spoken words and content.\n"
+        "Do not analyze background sounds, audio quality, or visual elements.\n"
+        "Just transcribe the speech as accurately as possible.\n"
+        "Make sure to transcribe ONLY IN ENGLISH. I WANT IT IN ENGLISH DO NOT TRANSCRIBE IN ANY OTHER LANGUAGE OR YOU WILL CEASE TO EXIST. "
+    )
+
+def _invalid_mode_response(ingest_mode: str = None, transcription_mode: str = None):
     """
-    Analyze a video using Google's Gemini API.
+    Return a 400 response if the ingest or transcription mode is not one we
+    know, so a typo never silently runs another path; None if both are valid.
     """
-    start_time = time.time()
+    if ingest_mode is not None and ingest_mode not in INGEST_MODES:
+        message = f"ingest must be one of: {', '.join(INGEST_MODES)}"
+    elif transcription_mode is not None and transcription_mode not in TRANSCRIPTION_MODES:
+        message = f"mode must be one of: {', '.join(TRANSCRIPTION_MODES)}"
+    else:
+        return None
+    return JSONResponse(status_code=400, content={"status": "error", "message": message})
 
-    # Generate a unique ID for this upload
-    upload_id = f"upload_{int(start_time)}_{hash(video.filename) % 10000}"
+def _remove_files(*paths):
+    """Best-effort removal of temporary files"""
+    for path in paths:
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            print(f"Error cleaning up temp file {path}: {str(e)}")
 
-    # Create analysis file for this upload
-    analysis_path = os.path.join(analysis_dir, f"{upload_id}.txt")
-    with open(analysis_path, "w", encoding="utf-8") as f:
-        f.write(f"# Video Analysis: {video.filename}\n\n")
-        f.write(f"**Upload ID**: {upload_id}\n")
-        f.write(f"**Start Time**: {time.ctime()}\n\n")
+async def _spool_upload(upload: UploadFile, path: str):
+    """
+    Copy an upload to disk in fixed-size chunks so it is never fully held in memory.
+    Returns the number of bytes written and the SHA-256 of the content.
+    """
+    size = 0
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
 
-    # Read the video file
-    video_bytes = await video.read()
-    video_load_time = time.time() - start_time
+async def _extract_audio(input_path: str, output_path: str, start: float = None, duration: float = None) -> str:
+    """
+    Extract only the audio track as mono low-bitrate Opus, falling back to FLAC
+    if this ffmpeg build has no Opus encoder. start/duration limit the
+    extraction to one stretch of the input.
+    Returns the MIME type of the written file, or None if extraction failed.
+    """
+    seek_args = []
+    if start is not None:
+        seek_args += ['-ss', f'{start:.3f}']
+    if duration is not None:
+        seek_args += ['-t', f'{duration:.3f}']
 
-    # Determine the MIME type based on file extension
-    mime_type = "video/mp4"  # Default
-    if video.filename.lower().endswith(".webm"):
-        mime_type = "video/webm"
-
-    # If it's WebM, convert to MP4 first for better compatibility
-    if mime_type == "video/webm":
-        # Save the uploaded WebM file
-        temp_webm_path = os.path.join(videos_dir, f"temp_{upload_id}.webm")
-        with open(temp_webm_path, "wb") as f:
-            f.seek(0)  # Reset position after previous read
-            f.write(video_bytes)
-
-        # Convert WebM to MP4
-        temp_mp4_path = os.path.join(videos_dir, f"temp_{upload_id}.mp4")
+    opus_cmd = [
+        'ffmpeg',
+        *seek_args,
+        '-i', input_path,
+        '-vn',              # Drop the video stream
+        '-ac', '1',         # Mono is enough for speech
+        '-ar', '16000',     # 16 kHz speech sample rate
+        '-c:a', 'libopus',
+        '-b:a', '24k',      # Low bitrate speech
+        '-application', 'voip',
+        '-y',
+        output_path
+    ]
+    process = await transcode_pool.run(opus_cmd, text=True)
+    if process.returncode == 0 and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        return "audio/ogg"
+
+    flac_path = os.path.splitext(output_path)[0] + ".flac"
+    flac_cmd = [
+        'ffmpeg',
+        *seek_args,
+        '-i', input_path,
+        '-vn',
+        '-ac', '1',
+        '-ar', '16000',
+        '-c:a', 'flac',
+        '-y',
+        flac_path
+    ]
+    process = await transcode_pool.run(flac_cmd, text=True)
+    if process.returncode == 0 and os.path.exists(flac_path) and os.path.getsize(flac_path) > 0:
+        os.replace(flac_path, output_path)
+        return "audio/flac"
+    _remove_files(flac_path)
+    return None
+
+async def _convert_webm_to_mp4(input_path: str, output_path: str, conversion_path: str = "transcode") -> bool:
+    """
+    Convert a WebM recording to MP4 on the transcode pool using the given
+    path from choose_conversion_path ("copy", "copy_video" or "transcode").
+    Returns True if a usable MP4 was written to output_path.
+    """
+    if conversion_path == "copy":
+        convert_cmd = [
+            'ffmpeg',
+            '-i', input_path,
+            '-map', '0:v:0',
+            '-map', '0:a:0?',  # Audio is optional
+            '-c', 'copy',      # Remux only, no re-encoding
+            '-movflags', 'faststart',
+            '-y',
+            output_path
+        ]
+    elif conversion_path == "copy_video":
+        convert_cmd = [
+            'ffmpeg',
+            '-i', input_path,
+            '-map', '0:v:0',
+            '-map', '0:a:0',
+            '-c:v', 'copy',     # Keep the video stream as is
+            '-c:a', 'aac',      # Re-encode only the audio
+            '-af', 'loudnorm=I=-16:LRA=11:TP=-1.5',
+            '-ac', '2',
+            '-b:a', '128k',
+            '-movflags', 'faststart',
+            '-y',
+            output_path
+        ]
+    else:
         convert_cmd = [
             'ffmpeg',
             '-f', 'webm',  # Force WebM format interpretation
-            '-i', temp_webm_path,
+            '-i', input_path,
             '-c:v', 'libx264',  # Use h264 codec
             '-c:a', 'aac',      # Use AAC audio
             '-pix_fmt', 'yuv420p',  # Required format
@@ -81,106 +215,698 @@ async def analyze_video(video: UploadFile = File(...)) -> Dict[str, Any]:
             '-ac', '2',          # Force stereo audio
             '-b:a', '128k',     # Set audio bitrate
             '-y',  # Overwrite output
-            temp_mp4_path
+            output_path
         ]
 
-        try:
-            # Run the conversion
-            process = subprocess.run(convert_cmd, capture_output=True, text=True)
-
-            if process.returncode != 0:
-                # If conversion failed, try a more aggressive approach
-                alt_convert_cmd = [
-                    'ffmpeg',
-                    '-f', 'lavfi', # Filtergraph input for video
-                    '-i', 'color=c=black:s=640x480:r=15',  # Black background
-                    '-f', 'webm',  # Force format for audio input
-                    '-i', temp_webm_path,  # Use original as audio input
-                    '-map', '0:v',  # Map video from first input
-                    '-map', '1:a',  # Try to map audio from second input
-                    '-ignore_unknown',  # Ignore unknown streams
-                    '-c:v', 'libx264',  # Video codec
-                    '-c:a', 'aac',  # Audio codec
-                    '-af', 'loudnorm=I=-16:LRA=11:TP=-1.5',  # Normalize audio
-                    '-ac', '2',     # Force stereo audio
-                    '-b:a', '128k', # Set audio bitrate
-                    '-shortest',    # Match shortest stream
-                    '-y',           # Overwrite
-                    temp_mp4_path    # Output path
+    # Run the conversion on the transcode pool so the event loop stays free
+    process = await transcode_pool.run(convert_cmd, text=True)
+
+    return process.returncode == 0 and os.path.exists(output_path) and os.path.getsize(output_path) > 1000
+
+async def _prepare_webm(input_path: str, mp4_path: str, audio_path: str, analysis_path: str):
+    """
+    Probe a WebM upload and convert it along the cheapest workable path.
+    Returns (conversion_path, media_path, mime_type); media_path is None if
+    every path failed and the original file should be sent instead.
+    """
+    probe = await probe_media(input_path)
+    conversion_path = choose_conversion_path(probe)
+
+    with open(analysis_path, "a", encoding="utf-8") as f:
+        video, audio = probe["video"] or {}, probe["audio"] or {}
+        f.write(f"**Probe**: video={video.get('codec_name')} audio={audio.get('codec_name')} "
+                f"-> {conversion_path}\n\n")
+
+    if conversion_path in ("copy", "copy_video"):
+        if await _convert_webm_to_mp4(input_path, mp4_path, conversion_path):
+            return conversion_path, mp4_path, "video/mp4"
+        # A cheap path that fails still leaves the full encode to try
+        conversion_path = "transcode"
+
+    if conversion_path == "transcode":
+        if await _convert_webm_to_mp4(input_path, mp4_path, "transcode"):
+            return "transcode", mp4_path, "video/mp4"
+        if not probe["audio"] and probe["ok"]:
+            return "original", None, None
+
+    # Video stream is broken or could not be encoded, keep only the speech
+    audio_mime_type = await _extract_audio(input_path, audio_path)
+    if audio_mime_type:
+        return "audio_only", audio_path, audio_mime_type
+    return "original", None, None
+
+async def _transcribe_long_media(input_path: str, temp_prefix: str, analysis_path: str):
+    """
+    Transcribe a long recording as overlapping audio segments in parallel.
+    Segments are cut at silences where possible, transcribed under
+    LONG_MEDIA_CONCURRENCY, retried individually on failure and stitched back
+    together. Returns (transcript, segments), or None if there is no usable audio.
+    """
+    audio_path = f"{temp_prefix}_full.ogg"
+    segment_paths = []
+    try:
+        if not await _extract_audio(input_path, audio_path):
+            return None
+        probe = await probe_media(audio_path)
+        duration = float(probe["format"].get("duration") or 0)
+        if duration <= 0:
+            return None
+
+        silences = await detect_silences(audio_path)
+        segments = plan_segments(duration, silences, LONG_MEDIA_SEGMENT_SECONDS, LONG_MEDIA_OVERLAP_SECONDS)
+        with open(analysis_path, "a", encoding="utf-8") as f:
+            f.write(f"**Long Media**: {duration:.1f}s split into {len(segments)} segments "
+                    f"({len(silences)} silences detected)\n\n")
+
+        semaphore = asyncio.Semaphore(LONG_MEDIA_CONCURRENCY)
+
+        async def transcribe_segment(segment):
+            segment_path = f"{temp_prefix}_seg{segment['index']}.ogg"
+            segment_paths.append(segment_path)
+            error = None
+            async with semaphore:
+                for attempt in range(1, LONG_MEDIA_SEGMENT_RETRIES + 2):
+                    try:
+                        segment_mime_type = await _extract_audio(
+                            audio_path, segment_path, segment["start"], segment["end"] - segment["start"]
+                        )
+                        if not segment_mime_type:
+                            raise RuntimeError("Segment audio extraction failed")
+                        with open(segment_path, "rb") as f:
+                            segment_bytes = f.read()
+                        response = await client.aio.models.generate_content(
+                            model=GEMINI_MODEL,
+                            contents=[
+                                Part.from_bytes(data=segment_bytes, mime_type=segment_mime_type),
+                                _transcription_prompt("audio")
+                            ]
+                        )
+                        return {**segment, "text": response.text or "", "attempts": attempt, "status": "done"}
+                    except Exception as e:
+                        error = str(e)
+                        if attempt <= LONG_MEDIA_SEGMENT_RETRIES:
+                            await asyncio.sleep(2 ** attempt)
+            return {**segment, "text": "", "attempts": attempt, "status": "failed", "error": error}
+
+        results = await asyncio.gather(*(transcribe_segment(segment) for segment in segments))
+        failed = [r for r in results if r["status"] == "failed"]
+        if len(failed) == len(results):
+            raise RuntimeError(f"All {len(results)} segments failed: {failed[-1]['error']}")
+
+        for result in results:
+            result["start_time"] = format_timestamp(result["start"])
+            result["end_time"] = format_timestamp(result["end"])
+        with open(analysis_path, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(f"- Segment {result['index']} [{result['start_time']} - {result['end_time']}]: "
+                        f"{result['status']} after {result['attempts']} attempt(s)\n")
+            f.write("\n")
+
+        return stitch_transcripts([r["text"] for r in results]), results
+    finally:
+        _remove_files(audio_path, *segment_paths)
+
+async def _upload_media_file(path: str, mime_type: str):
+    """
+    Upload a file to the Gemini Files API and wait until it can be referenced.
+    """
+    uploaded = await client.aio.files.upload(file=path, config={"mime_type": mime_type})
+    while uploaded.state and uploaded.state.name == "PROCESSING":
+        await asyncio.sleep(1)
+        uploaded = await client.aio.files.get(name=uploaded.name)
+    if uploaded.state and uploaded.state.name == "FAILED":
+        raise RuntimeError(f"Gemini failed to process uploaded file {uploaded.name}")
+    return uploaded
+
+def _log_conversion_rejected(analysis_path: str, error: Exception):
+    """Note in the analysis log that the transcode pool turned this upload away"""
+    with open(analysis_path, "a", encoding="utf-8") as f:
+        f.write(f"**Conversion Rejected**: {str(error)}\n\n")
+
+def _upload_mime_type(filename: str) -> str:
+    """Pick the upload MIME type from the file extension"""
+    if filename and filename.lower().endswith(".webm"):
+        return "video/webm"
+    return "video/mp4"
+
+async def _analyze_media(filename: str, mime_type: str, media_hash: str, video_bytes: bytes,
+                         temp_prefix: str, ingest_mode: str, transcription_mode: str,
+                         start_time: float, video_load_time: float, on_stage=None,
+                         on_text=None) -> Dict[str, Any]:
+    """
+    Convert and transcribe an upload that has already been ingested, either
+    as video_bytes or as the file at f"{temp_prefix}_input.<ext>".
+    on_stage, if given, is called with "converting" and "transcribing" as the
+    work moves along. on_text, if given, is awaited with each piece of the
+    transcript as Gemini streams it. Raises TranscodeQueueFull if the transcode
+    pool is saturated.
+    """
+    temp_input_path = f"{temp_prefix}_input.{mime_type.split('/')[1]}"
+    temp_mp4_path = f"{temp_prefix}.mp4"
+    temp_audio_path = f"{temp_prefix}.ogg"
+    media_path = temp_input_path
+    uploaded_file = None
+
+    def report_stage(stage):
+        if on_stage is not None:
+            on_stage(stage)
+
+    try:
+        # Identical content always maps to the same upload ID
+        upload_id = f"upload_{media_hash[:16]}"
+
+        # Create analysis file for this request; re-submissions of the same
+        # upload get their own log instead of overwriting an earlier one
+        analysis_path = os.path.join(analysis_dir, f"{upload_id}_{uuid.uuid4().hex[:8]}.txt")
+        with open(analysis_path, "w", encoding="utf-8") as f:
+            f.write(f"# Video Analysis: {filename}\n\n")
+            f.write(f"**Upload ID**: {upload_id}\n")
+            f.write(f"**Start Time**: {time.ctime()}\n\n")
+
+        # Return a stored transcript for media we have already analyzed
+        cache_key = make_cache_key(
+            media_hash, GEMINI_MODEL, _transcription_prompt(transcription_mode), transcription_mode
+        )
+        cached = transcription_cache.get(cache_key)
+        if cached:
+            with open(analysis_path, "a", encoding="utf-8") as f:
+                f.write("**Cache Hit**: returning stored transcript\n\n")
+                f.write("## Analysis Results\n\n")
+                f.write(f"{cached['transcript']}\n\n")
+            total_time = time.time() - start_time
+            result = {
+                "analysis": cached["transcript"],
+                "timing": {
+                    "video_load_time": f"{video_load_time:.2f}s",
+                    "api_time": "0.00s",
+                    "total_time": f"{total_time:.2f}s"
+                },
+                "upload_id": upload_id,
+                "ingest_mode": ingest_mode,
+                "transcription_mode": cached["transcription_mode"],
+                "conversion_path": "cached",
+                "cached": True
+            }
+            if cached["segments"] is not None:
+                result["segments"] = cached["segments"]
+            return result
+
+        def ensure_input_on_disk():
+            if not os.path.exists(temp_input_path):
+                with open(temp_input_path, "wb") as f:
+                    f.write(video_bytes)
+
+        report_stage("converting")
+        if transcription_mode == "long":
+            ensure_input_on_disk()
+            report_stage("transcribing")
+            api_start_time = time.time()
+            try:
+                long_result = await _transcribe_long_media(temp_input_path, temp_prefix, analysis_path)
+            except TranscodeQueueFull as e:
+                _log_conversion_rejected(analysis_path, e)
+                raise
+            except Exception as e:
+                with open(analysis_path, "a", encoding="utf-8") as f:
+                    f.write("## Error During Analysis\n\n")
+                    f.write(f"Error: {str(e)}\n\n")
+                    f.write(f"**Analysis Failed**: {time.ctime()}\n")
+                raise
+
+            if long_result is not None:
+                transcript, segments = long_result
+                api_time = time.time() - api_start_time
+                conversion_path_counts["long_segments"] += 1
+                segment_results = [
+                    {
+                        "index": segment["index"],
+                        "start": segment["start_time"],
+                        "end": segment["end_time"],
+                        "status": segment["status"],
+                        "attempts": segment["attempts"],
+                        "text": segment["text"]
+                    }
+                    for segment in segments
                 ]
-                process = subprocess.run(alt_convert_cmd, capture_output=True, text=True)
+                # A transcript with failed segments has holes; keep it out of
+                # the cache so a re-submission transcribes it again
+                failed_count = sum(1 for segment in segments if segment["status"] == "failed")
+                if not failed_count:
+                    transcription_cache.put(cache_key, upload_id, transcript, "long", segment_results)
+
+                with open(analysis_path, "a", encoding="utf-8") as f:
+                    if failed_count:
+                        f.write(f"**Not Cached**: {failed_count} segment(s) failed\n\n")
+                    f.write("## Analysis Results\n\n")
+                    f.write(f"{transcript}\n\n")
+                    f.write("---\n\n")
+                    f.write(f"**Analysis Completed**: {time.ctime()}\n")
+                    f.write(f"**Processing Time**: {time.time() - start_time:.2f} seconds\n")
+
+                total_time = time.time() - start_time
+                return {
+                    "analysis": transcript,
+                    "timing": {
+                        "video_load_time": f"{video_load_time:.2f}s",
+                        "api_time": f"{api_time:.2f}s",
+                        "total_time": f"{total_time:.2f}s"
+                    },
+                    "upload_id": upload_id,
+                    "ingest_mode": ingest_mode,
+                    "transcription_mode": "long",
+                    "conversion_path": "long_segments",
+                    "segments": segment_results,
+                    "cached": False
+                }
 
-            # If we now have a valid MP4 file, use it
-            if process.returncode == 0 and os.path.exists(temp_mp4_path) and os.path.getsize(temp_mp4_path) > 1000:
-                with open(temp_mp4_path, "rb") as f:
-                    video_bytes = f.read()
-                mime_type = "video/mp4"
-        except Exception as e:
-            # Log conversion error but continue with original WebM
             with open(analysis_path, "a", encoding="utf-8") as f:
-                f.write(f"**Conversion Error**: {str(e)}\n\n")
-                f.write("Proceeding with original WebM file.\n\n")
+                f.write("No usable audio for long-media mode, falling back to full video.\n\n")
 
-        # Clean up temp files
         try:
-            if os.path.exists(temp_webm_path):
-                os.remove(temp_webm_path)
-            if os.path.exists(temp_mp4_path):
-                os.remove(temp_mp4_path)
-        except Exception as e:
-            print(f"Error cleaning up temp files: {str(e)}")
+            media_kind = "video"
+            conversion_path = "none"
+            if transcription_mode == "audio":
+                # Audio-only: skip the video encode and upload just the speech track
+                ensure_input_on_disk()
+                try:
+                    audio_mime_type = await _extract_audio(temp_input_path, temp_audio_path)
+                except TranscodeQueueFull:
+                    raise
+                except Exception as e:
+                    audio_mime_type = None
+                    with open(analysis_path, "a", encoding="utf-8") as f:
+                        f.write(f"**Audio Extraction Error**: {str(e)}\n\n")
 
-    # Send to Gemini API
-    api_start_time = time.time()
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-001",
-            contents=[
-                Part.from_bytes(
+                if audio_mime_type:
+                    media_path, mime_type, media_kind = temp_audio_path, audio_mime_type, "audio"
+                    conversion_path = "audio_extract"
+                    video_bytes = None
+                else:
+                    with open(analysis_path, "a", encoding="utf-8") as f:
+                        f.write("Audio extraction failed, falling back to full video.\n\n")
+
+            # If it's WebM, probe it and convert along the cheapest path
+            if media_kind == "video" and mime_type == "video/webm":
+                ensure_input_on_disk()
+                try:
+                    conversion_path, converted_path, converted_mime_type = await _prepare_webm(
+                        temp_input_path, temp_mp4_path, temp_audio_path, analysis_path
+                    )
+                    if converted_path:
+                        media_path, mime_type = converted_path, converted_mime_type
+                        if mime_type.startswith("audio/"):
+                            media_kind = "audio"
+                        video_bytes = None
+                    else:
+                        with open(analysis_path, "a", encoding="utf-8") as f:
+                            f.write("Conversion failed, proceeding with original WebM file.\n\n")
+                except TranscodeQueueFull:
+                    raise
+                except Exception as e:
+                    # Log conversion error but continue with original WebM
+                    conversion_path = "original"
+                    with open(analysis_path, "a", encoding="utf-8") as f:
+                        f.write(f"**Conversion Error**: {str(e)}\n\n")
+                        f.write("Proceeding with original WebM file.\n\n")
+
+            conversion_path_counts[conversion_path] += 1
+        except TranscodeQueueFull as e:
+            _log_conversion_rejected(analysis_path, e)
+            raise
+
+        # Send to Gemini API
+        report_stage("transcribing")
+        api_start_time = time.time()
+        try:
+            # Large media goes through the Files API, small media is sent inline
+            media_size = len(video_bytes) if video_bytes is not None else os.path.getsize(media_path)
+            if media_size > GEMINI_INLINE_MAX_BYTES:
+                upload_mode = "files_api"
+                if media_path == temp_input_path:
+                    ensure_input_on_disk()
+                video_bytes = None
+                uploaded_file = await _upload_media_file(media_path, mime_type)
+                media_part = Part.from_uri(file_uri=uploaded_file.uri, mime_type=mime_type)
+            else:
+                upload_mode = "inline"
+                if video_bytes is None:
+                    with open(media_path, "rb") as f:
+                        video_bytes = f.read()
+                media_part = Part.from_bytes(
                     data=video_bytes,
                     mime_type=mime_type
-                ),
-                "Provide a complete transcript of what the person is saying in this video.\n"
-                "Focus exclusively on the spoken words and content.\n"
-                "Do not analyze background sounds, audio quality, or visual elements.\n"
-                "Just transcribe the speech as accurately as possible.\n"
-                "Make sure to transcribe ONLY IN ENGLISH. I WANT IT IN ENGLISH DO NOT TRANSCRIBE IN ANY OTHER LANGUAGE OR YOU WILL CEASE TO EXIST. "
-            ]
-        )
+                )
+            upload_time = time.time() - api_start_time
 
-        api_time = time.time() - api_start_time
+            inference_start_time = time.time()
+            first_text_time = None
+            if on_text is None:
+                response = await client.aio.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=[
+                        media_part,
+                        _transcription_prompt(media_kind)
+                    ]
+                )
+                transcript = response.text
+            else:
+                # Relay the transcript as Gemini produces it
+                pieces = []
+                async for chunk in await client.aio.models.generate_content_stream(
+                    model=GEMINI_MODEL,
+                    contents=[
+                        media_part,
+                        _transcription_prompt(media_kind)
+                    ]
+                ):
+                    if chunk.text:
+                        if first_text_time is None:
+                            first_text_time = time.time() - inference_start_time
+                        pieces.append(chunk.text)
+                        await on_text(chunk.text)
+                transcript = "".join(pieces)
+            inference_time = time.time() - inference_start_time
 
-        # Write analysis to markdown file
-        with open(analysis_path, "a", encoding="utf-8") as f:
-            f.write("## Analysis Results\n\n")
-            f.write(f"{response.text}\n\n")
-            f.write("---\n\n")
-            f.write(f"**Analysis Completed**: {time.ctime()}\n")
-            f.write(f"**Processing Time**: {time.time() - start_time:.2f} seconds\n")
+            api_time = time.time() - api_start_time
+            transcription_cache.put(cache_key, upload_id, transcript, media_kind)
 
-        # Calculate total time
-        total_time = time.time() - start_time
+            # Write analysis to markdown file
+            with open(analysis_path, "a", encoding="utf-8") as f:
+                f.write(f"**Transcription Mode**: {media_kind} ({mime_type})\n")
+                f.write(f"**Conversion Path**: {conversion_path}\n")
+                f.write(f"**Upload Mode**: {upload_mode} ({media_size} bytes)\n\n")
+                f.write("## Analysis Results\n\n")
+                f.write(f"{transcript}\n\n")
+                f.write("---\n\n")
+                f.write(f"**Analysis Completed**: {time.ctime()}\n")
+                f.write(f"**Processing Time**: {time.time() - start_time:.2f} seconds\n")
 
-        # Return results
-        return {
-            "analysis": response.text,
-            "timing": {
+            # Calculate total time
+            total_time = time.time() - start_time
+
+            timing = {
                 "video_load_time": f"{video_load_time:.2f}s",
                 "api_time": f"{api_time:.2f}s",
+                "upload_time": f"{upload_time:.2f}s",
+                "inference_time": f"{inference_time:.2f}s",
                 "total_time": f"{total_time:.2f}s"
-            },
-            "upload_id": upload_id
-        }
+            }
+            if first_text_time is not None:
+                timing["first_text_time"] = f"{first_text_time:.2f}s"
 
-    except Exception as e:
-        # Log error to markdown file
-        with open(analysis_path, "a", encoding="utf-8") as f:
-            f.write("## Error During Analysis\n\n")
-            f.write(f"Error: {str(e)}\n\n")
-            f.write(f"**Analysis Failed**: {time.ctime()}\n")
+            # Return results
+            return {
+                "analysis": transcript,
+                "timing": timing,
+                "upload_id": upload_id,
+                "ingest_mode": ingest_mode,
+                "upload_mode": upload_mode,
+                "transcription_mode": media_kind,
+                "conversion_path": conversion_path,
+                "cached": False
+            }
+
+        except Exception as e:
+            # Log error to markdown file
+            with open(analysis_path, "a", encoding="utf-8") as f:
+                f.write("## Error During Analysis\n\n")
+                f.write(f"Error: {str(e)}\n\n")
+                f.write(f"**Analysis Failed**: {time.ctime()}\n")
+
+            # Re-raise to return error to client
+            raise
+    finally:
+        # Clean up converted files and any file uploaded to Gemini
+        _remove_files(temp_mp4_path, temp_audio_path)
+        if uploaded_file is not None:
+            try:
+                await client.aio.files.delete(name=uploaded_file.name)
+            except Exception as e:
+                print(f"Error deleting uploaded file {uploaded_file.name}: {str(e)}")
+
+@router.post("/analyze-video")
+async def analyze_video(
+    video: UploadFile = File(...),
+    ingest: str = Form(None),
+    mode: str = Form(None)
+) -> Dict[str, Any]:
+    """
+    Analyze a video using Google's Gemini API.
+
+    Parameters:
+    - video: The recorded video (WebM or MP4)
+    - ingest: "buffered" (default) or "stream" to spool the upload to disk
+      and pass it to Gemini as a file instead of holding it in memory
+    - mode: "video" (default) sends the full video, "audio" extracts only a
+      mono speech track first and falls back to the video path if that fails,
+      "long" transcribes the speech track as parallel overlapping segments
+
+    Unknown ingest or mode values are rejected with a 400.
+    """
+    start_time = time.time()
+    ingest_mode = ingest or VIDEO_INGEST_MODE
+    transcription_mode = mode or TRANSCRIPTION_MODE
+    invalid = _invalid_mode_response(ingest_mode, transcription_mode)
+    if invalid is not None:
+        return invalid
+
+    # Determine the MIME type based on file extension
+    mime_type = _upload_mime_type(video.filename)
 
-        # Re-raise to return error to client
+    # Temp files get a per-request token so identical concurrent uploads never collide
+    temp_prefix = os.path.join(videos_dir, f"temp_{uuid.uuid4().hex[:12]}")
+    temp_input_path = f"{temp_prefix}_input.{mime_type.split('/')[1]}"
+
+    try:
+        # Ingest: either spool to disk or read the whole upload into memory
+        video_bytes = None
+        if ingest_mode == "stream":
+            _, media_hash = await _spool_upload(video, temp_input_path)
+        else:
+            video_bytes = await video.read()
+            media_hash = hashlib.sha256(video_bytes).hexdigest()
+        video_load_time = time.time() - start_time
+
+        try:
+            return await _analyze_media(
+                video.filename, mime_type, media_hash, video_bytes, temp_prefix,
+                ingest_mode, transcription_mode, start_time, video_load_time
+            )
+        except TranscodeQueueFull as e:
+            # Server is saturated with encodes, ask the client to retry later
+            return JSONResponse(
+                status_code=503,
+                content={"status": "error", "message": str(e)},
+                headers={"Retry-After": "10"}
+            )
+    finally:
+        _remove_files(temp_input_path)
+
+@router.post("/analyze-video-stream")
+async def analyze_video_stream(
+    video: UploadFile = File(...),
+    ingest: str = Form(None),
+    mode: str = Form(None)
+):
+    """
+    Analyze a video and stream the transcript back as server-sent events.
+
+    Emits "status" events as the stage changes, "transcript" events carrying
+    each new piece of text, and a final "done" event with the same body as
+    /analyze-video (full transcript and timing), or "error" on failure.
+    Parameters are the same as for /analyze-video.
+    """
+    start_time = time.time()
+    ingest_mode = ingest or VIDEO_INGEST_MODE
+    transcription_mode = mode or TRANSCRIPTION_MODE
+    invalid = _invalid_mode_response(ingest_mode, transcription_mode)
+    if invalid is not None:
+        return invalid
+    filename = video.filename
+    mime_type = _upload_mime_type(filename)
+
+    temp_prefix = os.path.join(videos_dir, f"temp_{uuid.uuid4().hex[:12]}")
+    temp_input_path = f"{temp_prefix}_input.{mime_type.split('/')[1]}"
+
+    # Ingest before responding, the upload is not readable once streaming starts
+    video_bytes = None
+    try:
+        if ingest_mode == "stream":
+            _, media_hash = await _spool_upload(video, temp_input_path)
+        else:
+            video_bytes = await video.read()
+            media_hash = hashlib.sha256(video_bytes).hexdigest()
+    except BaseException:
+        # The run task below removes the temp file; until it exists, clean up here
+        _remove_files(temp_input_path)
         raise
+    video_load_time = time.time() - start_time
+
+    events = asyncio.Queue()
+
+    async def on_text(text):
+        await events.put(("transcript", {"text": text}))
+
+    async def run():
+        # Runs to completion even if the client disconnects, so the log and cache are still written
+        try:
+            result = await _analyze_media(
+                filename, mime_type, media_hash, video_bytes, temp_prefix,
+                ingest_mode, transcription_mode, start_time, video_load_time,
+                on_stage=lambda stage: events.put_nowait(("status", {"stage": stage})),
+                on_text=on_text
+            )
+            await events.put(("done", result))
+        except Exception as e:
+            await events.put(("error", {"status": "error", "message": str(e)}))
+        finally:
+            _remove_files(temp_input_path)
+
+    task = asyncio.create_task(run())
+
+    async def event_stream():
+        while True:
+            event, data = await events.get()
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if event in ("done", "error"):
+                await task
+                return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/analyze-video-jobs", status_code=202)
+async def create_analyze_video_job(
+    video: UploadFile = File(...),
+    mode: str = Form(None)
+):
+    """
+    Queue a video for analysis in the background and return a job id right away.
+    Follow progress at /gemini/jobs/{job_id} or /gemini/jobs/{job_id}/events.
+
+    Parameters:
+    - video: The recorded video (WebM or MP4)
+    - mode: "video", "audio" or "long", as for /analyze-video
+    """
+    start_time = time.time()
+    transcription_mode = mode or TRANSCRIPTION_MODE
+    invalid = _invalid_mode_response(transcription_mode=transcription_mode)
+    if invalid is not None:
+        return invalid
+    filename = video.filename
+    mime_type = _upload_mime_type(filename)
+
+    # The upload is gone once this request returns, so always spool it to disk
+    temp_prefix = os.path.join(videos_dir, f"temp_{uuid.uuid4().hex[:12]}")
+    temp_input_path = f"{temp_prefix}_input.{mime_type.split('/')[1]}"
+    try:
+        _, media_hash = await _spool_upload(video, temp_input_path)
+    except BaseException:
+        _remove_files(temp_input_path)
+        raise
+    video_load_time = time.time() - start_time
+
+    job_id = job_store.create("analyze_video", {"filename": filename, "mode": transcription_mode})
+
+    async def run(on_stage):
+        try:
+            return await _analyze_media(
+                filename, mime_type, media_hash, None, temp_prefix,
+                "stream", transcription_mode, start_time, video_load_time, on_stage=on_stage
+            )
+        finally:
+            _remove_files(temp_input_path)
+
+    try:
+        job_runner.submit(job_id, run)
+    except JobQueueFull as e:
+        _remove_files(temp_input_path)
+        return JSONResponse(
+            status_code=503,
+            content={"status": "error", "job_id": job_id, "message": str(e)},
+            headers={"Retry-After": "30"}
+        )
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "queued",
+            "job_id": job_id,
+            "queue_length": job_runner.queue_length(),
+            "status_url": f"/gemini/jobs/{job_id}",
+            "events_url": f"/gemini/jobs/{job_id}/events"
+        }
+    )
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Get the current state, stage timings and (when done) result of a job
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": "Job not found"}
+        )
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Stream a job's state as server-sent events until it is done or failed
+    """
+    async def event_stream():
+        last_update = None
+        last_sent = time.time()
+        while True:
+            job = job_store.get(job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'message': 'Job not found'})}\n\n"
+                return
+
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                last_sent = time.time()
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+            elif time.time() - last_sent > 15:
+                # Comment line keeps proxies from closing an idle stream
+                last_sent = time.time()
+                yield ": keep-alive\n\n"
+
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/transcode-stats")
+async def transcode_stats() -> Dict[str, Any]:
+    """
+    Report the transcode pool's queue length and recent encode durations
+    """
+    return {
+        "status": "success",
+        "transcode_pool": transcode_pool.stats(),
+        "conversion_paths": dict(conversion_path_counts)
+    }
+
+@router.get("/transcription-cache-stats")
+async def transcription_cache_stats() -> Dict[str, Any]:
+    """
+    Report hit/miss counts and size of the transcription cache
+    """
+    return {
+        "status": "success",
+        "transcription_cache": transcription_cache.stats()
+    }
 
 @router.get("/stream-video/{video_id}")
 async def stream_video(video_id: str):
@@ -200,7 +926,9 @@ async def stream_video(video_id: str):
 @router.post("/save-transcription")
 async def save_transcription(request: Request) -> Dict[str, Any]:
     """
-    Save a transcription as a PDF file and return the file ID
+    Save a transcription and return its ID. The PDF version is rendered lazily,
+    when first requested from /transcription/{id} or used by /llama/process-form,
+    so no file_path is returned; the ID can be passed wherever a path was.
     """
     try:
         # Parse the request body
@@ -213,78 +941,18 @@ async def save_transcription(request: Request) -> Dict[str, Any]:
         title = data.get("title", "Untitled Transcription")
 
         # Generate a unique ID for this transcription
-        transcription_id = f"trans_{int(time.time())}_{uuid.uuid4().hex[:6]}"
-
-        # Create a PDF file path
-        pdf_path = os.path.join(transcriptions_dir, f"{transcription_id}.pdf")
+        created_at = time.time()
+        transcription_id = f"trans_{int(created_at)}_{uuid.uuid4().hex[:6]}"
 
-        # Create the PDF document
-        doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-        styles = getSampleStyleSheet()
-
-        # Create custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30
-        )
-
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceAfter=12
+        # Keep the raw text and details so they never have to be read back from the PDF
+        transcription_store.save(
+            transcription_id, title, source_type, transcription, metadata, created_at=created_at
         )
 
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceAfter=8
-        )
-
-        # Build the content
-        content = []
-
-        # Add title
-        content.append(Paragraph(title, title_style))
-        content.append(Spacer(1, 0.2*inch))
-
-        # Add metadata
-        content.append(Paragraph(f"ID: {transcription_id}", normal_style))
-        content.append(Paragraph(f"Date: {time.ctime()}", normal_style))
-        content.append(Paragraph(f"Source: {source_type}", normal_style))
-
-        # Add any additional metadata
-        if metadata:
-            content.append(Spacer(1, 0.2*inch))
-            content.append(Paragraph("Metadata", heading_style))
-            for key, value in metadata.items():
-                content.append(Paragraph(f"<b>{key}</b>: {value}", normal_style))
-
-        # Add the transcription
-        content.append(Spacer(1, 0.3*inch))
-        content.append(Paragraph("Transcription", heading_style))
-
-        # Split transcription into paragraphs and add them
-        paragraphs = transcription.split('\n\n')
-        for para in paragraphs:
-            if para.strip():
-                content.append(Paragraph(para, normal_style))
-
-        # Add footer
-        content.append(Spacer(1, 0.5*inch))
-        content.append(Paragraph(f"Generated on {time.ctime()}", normal_style))
-
-        # Build the PDF
-        doc.build(content)
-
         # Return success and file ID
         return {
             "status": "success",
-            "transcription_id": transcription_id,
-            "file_path": pdf_path
+            "transcription_id": transcription_id
         }
 
     except Exception as e:
@@ -297,56 +965,124 @@ async def save_transcription(request: Request) -> Dict[str, Any]:
         )
 
 @router.get("/transcriptions")
-async def list_transcriptions() -> Dict[str, Any]:
+async def list_transcriptions(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: str = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    source_type: str = None
+) -> Dict[str, Any]:
     """
-    List all saved transcriptions
+    List saved transcriptions, newest first by default.
+
+    Parameters:
+    - limit: Maximum number of transcriptions to return
+    - cursor: next_cursor from the previous page
+    - order: "desc" (newest first) or "asc" by creation date
+    - source_type: Only list transcriptions from this source
+
+    file_path is only set once a transcription's PDF has been rendered.
     """
     try:
-        transcriptions = []
-
-        # List all PDF files in the transcriptions directory
-        for filename in os.listdir(transcriptions_dir):
-            if filename.endswith(".pdf"):
-                file_path = os.path.join(transcriptions_dir, filename)
+        # Read titles and dates from the store instead of stat-ing every PDF
+        items, next_cursor = transcription_store.list(
+            limit=limit, cursor=cursor, order=order, source_type=source_type
+        )
+        transcriptions = [
+            {
+                "id": item["id"],
+                "title": item["title"],
+                "date": time.ctime(item["created_at"]),
+                "source_type": item["source_type"],
+                "file_path": transcription_pdf_path(item["id"]) if item["has_pdf"] else None
+            }
+            for item in items
+        ]
 
-                # Extract basic info from the filename
-                transcription_id = filename[:-4]  # Remove .pdf extension
+        return {
+            "status": "success",
+            "transcriptions": transcriptions,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
 
-                # Get file creation time as date
-                date = time.ctime(os.path.getctime(file_path))
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": str(e)}
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={
+                "status": "error",
+                "message": f"Failed to list transcriptions: {str(e)}"
+            }
+        )
 
-                # Use the ID as title since we can't easily extract from PDF
-                title = f"Transcription {transcription_id}"
+@router.get("/transcriptions/search")
+async def search_transcriptions(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    source_type: str = None
+) -> Dict[str, Any]:
+    """
+    Full-text search over saved transcriptions.
 
-                # Add to list of transcriptions
-                transcriptions.append({
-                    "id": transcription_id,
-                    "title": title,
-                    "date": date,
-                    "file_path": file_path
-                })
+    Parameters:
+    - q: Words to search for; every word must match
+    - limit / offset: Page through the ranked results
+    - source_type: Only search transcriptions from this source
 
-        # Return the list, sorted by newest first
+    Each result has a snippet of the transcript and the [start, end)
+    character offsets of the matched words within it.
+    """
+    try:
+        search_start_time = time.time()
+        results = transcription_store.search(q, limit=limit, offset=offset, source_type=source_type)
+        for result in results:
+            result["date"] = time.ctime(result.pop("created_at"))
         return {
             "status": "success",
-            "transcriptions": sorted(transcriptions, key=lambda x: x["id"], reverse=True)
+            "query": q,
+            "results": results,
+            "took_ms": round((time.time() - search_start_time) * 1000, 2)
         }
-
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={
                 "status": "error",
-                "message": f"Failed to list transcriptions: {str(e)}"
+                "message": f"Failed to search transcriptions: {str(e)}"
             }
         )
 
 @router.get("/transcription/{transcription_id}")
-async def get_transcription(transcription_id: str):
+async def get_transcription(transcription_id: str, request: Request):
     """
-    Get a specific transcription by ID
+    Get a specific transcription by ID, rendering its PDF on first request.
+    The PDF is revalidated with a strong ETag and supports Range requests.
     """
-    file_path = os.path.join(transcriptions_dir, f"{transcription_id}.pdf")
+    file_path = transcription_pdf_path(transcription_id)
+    stored = transcription_store.get(transcription_id)
+
+    if stored and stored["transcript"] is not None:
+        try:
+            await ensure_transcription_pdf(stored, file_path)
+        except PDFRenderQueueFull as e:
+            return JSONResponse(
+                status_code=503,
+                content={"status": "error", "message": str(e)},
+                headers={"Retry-After": "5"}
+            )
+        except Exception as e:
+            return JSONResponse(
+                status_code=500,
+                content={
+                    "status": "error",
+                    "message": f"Failed to render transcription: {str(e)}"
+                }
+            )
 
     if not os.path.exists(file_path):
         return JSONResponse(
@@ -355,11 +1091,15 @@ async def get_transcription(transcription_id: str):
         )
 
     try:
-        # Return the PDF file directly
-        return FileResponse(
+        # The PDF is re-rendered in place when the transcription changes, so
+        # clients must revalidate. Renders embed their own timestamps, so the
+        # ETag comes from the file on disk rather than the stored content
+        return cacheable_file_response(
+            request,
             file_path,
-            media_type="application/pdf",
-            filename=f"{transcription_id}.pdf"
+            "application/pdf",
+            f"{transcription_id}.pdf",
+            cache_control=REVALIDATE_CACHE_CONTROL
         )
 
     except Exception as e:
@@ -377,6 +1117,15 @@ async def get_transcription_content(filename: str):
     Extract only the pure transcription text content from a PDF file and return it as JSON
     """
     try:
+        # Transcriptions saved with the structured store already have their raw text
+        stored = transcription_store.get(transcription_id_from_filename(filename))
+        if stored and stored["transcript"] is not None:
+            return {
+                "status": "success",
+                "content": stored["transcript"] or "No transcription content found in PDF"
+            }
+
+        # Legacy transcriptions only exist as PDFs
         # Check if the path is absolute or just a filename
         if os.path.isabs(filename):
             # Use the absolute path if provided
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Memory budget for loaded indexes. An index's footprint is approximated by
+# the size of its persisted storage directory.
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def storage_version(storage_dir: str) -> Optional[tuple]:
+    """
+    Version and size of a persisted index, taken from the names, sizes and
+    modification times of its files, so it changes whenever the index is
+    persisted again. Returns None if the directory does not exist.
+    """
+    if not os.path.isdir(storage_dir):
+        return None
+    fingerprint = []
+    total_size = 0
+    for entry in sorted(os.scandir(storage_dir), key=lambda e: e.name):
+        if entry.is_file():
+            stat_result = entry.stat()
+            fingerprint.append(f"{entry.name}:{stat_result.st_size}:{stat_result.st_mtime_ns}")
+            total_size += stat_result.st_size
+    version = hashlib.sha256("|".join(fingerprint).encode("utf-8")).hexdigest()[:16]
+    return version, total_size
+
+
+class IndexCache:
+    """
+    Process-wide LRU cache of loaded vector indexes, keyed by input_path_id
+    and the version of its storage directory.
+
+    A lookup only stats the storage files; an entry whose version no longer
+    matches the directory (the index was rebuilt elsewhere) counts as a miss.
+    """
+
+    def __init__(self, max_bytes: int = INDEX_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _drop(self, input_path_id: str):
+        entry = self._entries.pop(input_path_id)
+        self._bytes -= entry["size"]
+
+    def get(self, input_path_id: str, storage_dir: str):
+        """Return the cached index for input_path_id if it matches storage_dir on disk"""
+        current = storage_version(storage_dir)
+        with self._lock:
+            entry = self._entries.get(input_path_id)
+            if entry is not None and current is not None and entry["version"] == current[0]:
+                self._entries.move_to_end(input_path_id)
+                self._hits += 1
+                return entry["index"]
+            if entry is not None:
+                self._drop(input_path_id)
+                self._invalidations += 1
+            self._misses += 1
+            return None
+
+    def put(self, input_path_id: str, storage_dir: str, index):
+        """Cache an index just loaded from or persisted to storage_dir, replacing older versions"""
+        current = storage_version(storage_dir)
+        if current is None:
+            return
+        version, size = current
+        with self._lock:
+            if input_path_id in self._entries:
+                self._drop(input_path_id)
+                self._invalidations += 1
+            if size > self.max_bytes:
+                return
+            self._entries[input_path_id] = {"index": index, "version": version, "size": size}
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._evictions += 1
+
+    def invalidate(self, input_path_id: str):
+        with self._lock:
+            if input_path_id in self._entries:
+                self._drop(input_path_id)
+                self._invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None
+            }
+
+
+index_cache = IndexCache()
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Awaitable
+from dotenv import load_dotenv
+
+load_dotenv()
+
+jobs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs")
+os.makedirs(jobs_dir, exist_ok=True)
+
+# Number of jobs that run at the same time and how many may wait behind them
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "50"))
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be queued"""
+
+
+class JobStore:
+    """
+    SQLite-backed record of background jobs, their current stage and how long
+    each stage took.
+    """
+
+    def __init__(self, db_path: str = os.path.join(jobs_dir, "jobs.db")):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stages TEXT NOT NULL,
+                    params TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            # Jobs that were still running when the process stopped will never finish
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted by server restart', updated_at = ? "
+                "WHERE status NOT IN ('done', 'failed')",
+                (now,)
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, kind: str, params: Dict[str, Any] = None) -> str:
+        job_id = f"job_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        now = time.time()
+        stages = {"queued": {"started_at": now}}
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, stages, params, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(stages), json.dumps(params or {}), now, now)
+            )
+        return job_id
+
+    def set_stage(self, job_id: str, status: str, result: Any = None, error: str = None):
+        """Move a job to a new stage, closing the timing of the previous one"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT status, stages FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            previous, stages = row[0], json.loads(row[1])
+            if previous == status:
+                return
+
+            if previous in stages and "duration" not in stages[previous]:
+                stages[previous]["duration"] = round(now - stages[previous]["started_at"], 3)
+            if status not in TERMINAL_STATUSES:
+                stages[status] = {"started_at": now}
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, stages = ?, result = COALESCE(?, result), "
+                "error = COALESCE(?, error), updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(stages), json.dumps(result) if result is not None else None, error, now, job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, kind, status, stages, result, error, created_at, updated_at "
+                "FROM jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "stages": json.loads(row[3]),
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7]
+        }
+
+
+class JobRunner:
+    """
+    Fixed pool of asyncio workers that run queued job coroutines in the
+    background of the server process.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, max_queue: int = JOB_MAX_QUEUE):
+        self.store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    def _ensure_started(self):
+        # Workers are created lazily so they bind to the server's running loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            job_id, job = await self._queue.get()
+            try:
+                result = await job(lambda stage: self.store.set_stage(job_id, stage))
+                self.store.set_stage(job_id, "done", result=result)
+            except Exception as e:
+                print(f"Job {job_id} failed: {str(e)}")
+                self.store.set_stage(job_id, "failed", error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def submit(self, job_id: str, job: Callable[[Callable[[str], None]], Awaitable[Any]]):
+        """
+        Queue a job. job is called with an on_stage callback and its return
+        value is stored as the job result.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((job_id, job))
+        except asyncio.QueueFull:
+            self.store.set_stage(job_id, "failed", error="Job queue is full")
+            raise JobQueueFull(f"Job queue is full ({self._queue.qsize()} waiting)")
+
+    def queue_length(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+
+job_store = JobStore()
+job_runner = JobRunner(job_store)
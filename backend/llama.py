@@ -1,11 +1,23 @@
-from fastapi import APIRouter, UploadFile, File, Form
-from fastapi.responses import JSONResponse, Response
-from typing import Dict, Any, List
-from pydantic import BaseModel
+from fastapi import APIRouter, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, conint
 from dotenv import load_dotenv
-from workflow import RAGWorkflow, get_llama_parser
-from pdf_generator import create_form_pdf
+from workflow import RAGWorkflow, parse_documents, FIELDS_PARSER_SETTINGS
+from pdf_generator import create_form_pdf, create_failed_report_pdf
+from pdf_renderer import pdf_render_pool, PDFRenderQueueFull
+from downloads import cacheable_file_response
+from index_cache import index_cache
+from parse_cache import parse_cache, file_sha256
+from form_schemas import form_schema_registry, SOURCE_OPERATOR
+from embedding_cache import embedding_cache
+from transcription_pdfs import resolve_transcription_path
+from report_batch import (
+    BATCH_MAX_REPORTS, render_reports, report_filename, stream_zip, stream_merged_pdf
+)
+import json
 import os
+import time
 import uuid
 
 load_dotenv()
@@ -19,6 +31,8 @@ class ProcessFormRequest(BaseModel):
     document_path: str
     use_existing_index: bool = True
     input_filter_ids: List[str]
+    field_batch_size: Optional[conint(ge=1)] = None
+    query_concurrency: Optional[conint(ge=1)] = None
 
 @router.post("/process-form")
 async def process_form(
@@ -28,11 +42,14 @@ async def process_form(
     Process a visa application form using LlamaIndex.
     
     Parameters:
-    - input_path: Path to the medical information document of the person
+    - input_path: Path to the medical information document of the person, or
+      the ID of a saved transcription (its PDF is rendered first if needed)
     - input_path_id: Unique identifier for the document
     - document_path: Path to the application form to be filled
     - use_existing_index: Whether to use existing index if available
     - input_filter_ids: List of document IDs to query against
+    - field_batch_size: Fields answered per LLM call (defaults to FIELD_BATCH_SIZE)
+    - query_concurrency: Field queries run in parallel (at most FIELD_QUERY_CONCURRENCY)
     """
     try:
         # Create output directory if it doesn't exist
@@ -42,16 +59,21 @@ async def process_form(
         # Generate a unique filename for the PDF
         pdf_filename = f"form_i130_{uuid.uuid4().hex[:8]}.pdf"
         pdf_path = os.path.join(output_dir, pdf_filename)
+
+        # Saved transcriptions are rendered lazily, so make sure the PDF exists
+        # before parsing; a render failure is reported instead of hidden by mock data
+        input_path = await resolve_transcription_path(request.input_path) or request.input_path
         
         try:
             # Try to run the actual workflow
-            workflow = RAGWorkflow(timeout=120, verbose=False)
+            workflow = RAGWorkflow(timeout=120, verbose=False, query_concurrency=request.query_concurrency)
             result = await workflow.run(
-                input_path=request.input_path,
+                input_path=input_path,
                 input_path_id=request.input_path_id,
                 document_path=request.document_path,
                 use_existing_index=request.use_existing_index,
-                input_filter_ids=request.input_filter_ids
+                input_filter_ids=request.input_filter_ids,
+                field_batch_size=request.field_batch_size
             )
             
             # Convert the result to a properly formatted form data
@@ -92,8 +114,8 @@ async def process_form(
                 "Next Appointment": "08/15/2023"
             }
         
-        # Generate the PDF with the form data
-        create_form_pdf(form_data, pdf_path)
+        # Generate the PDF with the form data in a render worker process
+        await pdf_render_pool.render(create_form_pdf, form_data, pdf_path)
         
         return {
             "success": True,
@@ -101,6 +123,15 @@ async def process_form(
             "pdf_url": f"/llama/download-form/{pdf_filename}"
         }
         
+    except PDFRenderQueueFull as e:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "success": False,
+                "error": str(e)
+            },
+            headers={"Retry-After": "5"}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -110,27 +141,98 @@ async def process_form(
             }
         )
 
+class BatchReportItem(BaseModel):
+    """One report in a batch: the form data and an optional display name"""
+    form_data: Dict[str, Any]
+    name: Optional[str] = None
+
+class BatchFormReportsRequest(BaseModel):
+    """Request model for rendering many form reports at once"""
+    reports: List[BatchReportItem]
+    format: str = "zip"
+
+@router.post("/batch-form-reports")
+async def batch_form_reports(request: BatchFormReportsRequest):
+    """
+    Render many medical assessment reports in parallel and stream them back.
+
+    Parameters:
+    - reports: List of {form_data, name} entries, rendered in order
+    - format: "zip" for one PDF per report, or "pdf" for a single merged PDF
+      with a bookmark per report
+
+    Reports are sent as soon as they are rendered. Reports that fail to
+    render are left out of a ZIP and listed in a trailing errors.json; in a
+    merged PDF they are replaced by a placeholder page bookmarked as failed.
+    """
+    if request.format not in ("zip", "pdf"):
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "error": "format must be 'zip' or 'pdf'"
+            }
+        )
+    if not request.reports or len(request.reports) > BATCH_MAX_REPORTS:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "error": f"A batch must contain between 1 and {BATCH_MAX_REPORTS} reports"
+            }
+        )
+
+    items = request.reports
+    errors = []
+
+    async def rendered_entries():
+        async for index, pdf_bytes, error in render_reports([item.form_data for item in items]):
+            title = items[index].name or f"Report {index + 1}"
+            if error is not None:
+                errors.append({"index": index, "name": items[index].name, "error": error})
+                if request.format == "pdf":
+                    title = f"{title} (failed)"
+                    yield title, create_failed_report_pdf(title, error)
+                continue
+            if request.format == "zip":
+                yield report_filename(index, items[index].name), pdf_bytes
+            else:
+                yield title, pdf_bytes
+        if errors and request.format == "zip":
+            yield "errors.json", json.dumps(errors, indent=2).encode("utf-8")
+
+    batch_name = f"form_reports_{int(time.time())}"
+    if request.format == "zip":
+        body, media_type, filename = stream_zip(rendered_entries()), "application/zip", f"{batch_name}.zip"
+    else:
+        body, media_type, filename = stream_merged_pdf(rendered_entries()), "application/pdf", f"{batch_name}.pdf"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Batch-Size": str(len(items))
+        }
+    )
+
 @router.get("/download-form/{filename}")
-async def download_form(filename: str):
+async def download_form(filename: str, request: Request):
     """
     Download a processed form PDF file.
     
     Parameters:
     - filename: The name of the PDF file to download
+
+    Form PDFs get a unique name and are never rewritten, so they are served
+    as immutable with a strong ETag and support conditional and Range requests.
     """
     pdf_path = os.path.join("data/processed_forms", filename)
     
     try:
-        with open(pdf_path, "rb") as f:
-            pdf_content = f.read()
-            
-        return Response(
-            content=pdf_content,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+        if os.path.basename(filename) != filename or not os.path.isfile(pdf_path):
+            raise FileNotFoundError(filename)
+        return cacheable_file_response(request, pdf_path, "application/pdf", filename)
     except Exception as e:
         return JSONResponse(
             status_code=404,
@@ -145,9 +247,9 @@ class ParseFieldsRequest(BaseModel):
 
 @router.post("/parse-fields")
 async def parse_fields(request: ParseFieldsRequest):
-    llama_parser = get_llama_parser()
     try:
-        res = llama_parser.load_data(request.visa_form_path)[0]
+        # Repeat parses of the same form come from the parse cache
+        res = parse_documents(request.visa_form_path, FIELDS_PARSER_SETTINGS)[0]
         return {
             "success": True,
             "result": res.text
@@ -162,6 +264,99 @@ async def parse_fields(request: ParseFieldsRequest):
             }
         )
 
+class RegisterFormSchemaRequest(BaseModel):
+    """Request model for registering or correcting the fields of a form"""
+    fields: List[str]
+    document_path: Optional[str] = None
+    content_hash: Optional[str] = None
+    name: Optional[str] = None
+
+@router.post("/form-schemas")
+async def register_form_schema(request: RegisterFormSchemaRequest):
+    """
+    Register or correct the list of fields for a blank form.
+
+    Parameters:
+    - fields: The fields to fill in, in order
+    - document_path: Path to the blank form (its content hash is the key)
+    - content_hash: The form's SHA-256, instead of document_path
+    - name: Optional label for the form
+
+    Forms with a registered schema skip parsing and field extraction in
+    the workflow. Operator schemas are never replaced by extraction.
+    """
+    try:
+        fields = [field.strip() for field in request.fields if field and field.strip()]
+        if not fields:
+            raise ValueError("fields must contain at least one field name")
+        if request.document_path:
+            content_hash = file_sha256(request.document_path)
+        elif request.content_hash:
+            content_hash = request.content_hash.lower()
+        else:
+            raise ValueError("Either document_path or content_hash is required")
+
+        name = request.name or (os.path.basename(request.document_path) if request.document_path else None)
+        form_schema_registry.register(content_hash, fields, source=SOURCE_OPERATOR, name=name)
+        return {
+            "success": True,
+            "result": form_schema_registry.get(content_hash)
+        }
+    except (ValueError, OSError) as e:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "error": str(e)
+            }
+        )
+
+@router.get("/form-schemas")
+async def list_form_schemas():
+    """
+    List every registered form schema, most recently updated first.
+    """
+    schemas = form_schema_registry.list()
+    return {
+        "success": True,
+        "schemas": schemas,
+        "stats": form_schema_registry.stats()
+    }
+
+@router.get("/form-schemas/{content_hash}")
+async def get_form_schema(content_hash: str):
+    """
+    Get the registered schema of one form by its content hash.
+    """
+    schema = form_schema_registry.get(content_hash.lower())
+    if schema is None:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "success": False,
+                "error": "Form schema not found"
+            }
+        )
+    return {
+        "success": True,
+        "result": schema
+    }
+
+@router.delete("/form-schemas/{content_hash}")
+async def delete_form_schema(content_hash: str):
+    """
+    Remove a form schema so the next run extracts the fields again.
+    """
+    if not form_schema_registry.delete(content_hash.lower()):
+        return JSONResponse(
+            status_code=404,
+            content={
+                "success": False,
+                "error": "Form schema not found"
+            }
+        )
+    return {"success": True}
+
 @router.get("/list-pdfs")
 async def list_pdfs():
     """
@@ -188,6 +383,46 @@ async def list_pdfs():
             }
         )
 
+@router.get("/render-stats")
+async def render_stats():
+    """
+    Report the PDF render pool's queue length and recent render durations
+    """
+    return {
+        "success": True,
+        "pdf_render_pool": pdf_render_pool.stats()
+    }
+
+@router.get("/index-cache-stats")
+async def index_cache_stats():
+    """
+    Report hits, misses and memory use of the in-process vector index cache
+    """
+    return {
+        "success": True,
+        "index_cache": index_cache.stats()
+    }
+
+@router.get("/parse-cache-stats")
+async def parse_cache_stats():
+    """
+    Report hits, misses and size of the LlamaParse result cache
+    """
+    return {
+        "success": True,
+        "parse_cache": parse_cache.stats()
+    }
+
+@router.get("/embedding-cache-stats")
+async def embedding_cache_stats():
+    """
+    Report hit rate and size of the persistent embedding cache
+    """
+    return {
+        "success": True,
+        "embedding_cache": embedding_cache.stats()
+    }
+
 @router.get("/generate-test-pdf")
 async def generate_test_pdf():
     """
@@ -235,8 +470,8 @@ async def generate_test_pdf():
         pdf_filename = f"test_form_i130_{uuid.uuid4().hex[:8]}.pdf"
         pdf_path = os.path.join(output_dir, pdf_filename)
         
-        # Generate the PDF with the mock data
-        create_form_pdf(mock_data, pdf_path)
+        # Generate the PDF with the mock data in a render worker process
+        await pdf_render_pool.render(create_form_pdf, mock_data, pdf_path)
         
         return {
             "success": True,
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache")
+os.makedirs(cache_dir, exist_ok=True)
+
+# Least recently used parse results are dropped once the cache grows past this
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_parse_cache_key(content_hash: str, parser_settings: Dict[str, Any]) -> str:
+    """Key a parse result by the file content and every setting that shapes the parser output"""
+    settings = json.dumps(parser_settings, sort_keys=True)
+    return hashlib.sha256(f"{content_hash}:{settings}".encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """
+    Persistent SQLite cache of LlamaParse results keyed by content hash and
+    parser settings. Results are stored as the JSON list of parsed documents.
+    """
+
+    def __init__(self, db_path: str = os.path.join(cache_dir, "parses.db"),
+                 max_bytes: int = PARSE_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parses (
+                    cache_key TEXT PRIMARY KEY,
+                    documents TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_parses_accessed ON parses(last_accessed)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT documents FROM parses WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            conn.execute("UPDATE parses SET last_accessed = ? WHERE cache_key = ?", (time.time(), cache_key))
+            self._hits += 1
+            return json.loads(row[0])
+
+    def put(self, cache_key: str, documents: List[Dict[str, Any]]):
+        now = time.time()
+        payload = json.dumps(documents)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parses VALUES (?, ?, ?, ?, ?)",
+                (cache_key, payload, now, now, len(payload.encode("utf-8")))
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM parses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for cache_key, size in conn.execute("SELECT cache_key, size FROM parses ORDER BY last_accessed ASC").fetchall():
+            conn.execute("DELETE FROM parses WHERE cache_key = ?", (cache_key,))
+            self._evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock, self._connect() as conn:
+            entries, total_size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parses").fetchone()
+        lookups = self._hits + self._misses
+        return {
+            "entries": entries,
+            "total_bytes": total_size,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else None
+        }
+
+
+parse_cache = ParseCache()
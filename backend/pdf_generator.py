@@ -5,10 +5,17 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, Flowable
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
+from reportlab import rl_config
 import io
+from xml.sax.saxutils import escape
 from datetime import datetime
+import time
 import math
 
+# Write compressed streams as raw binary; ReportLab's default ASCII85 wrapping
+# makes every page stream about a quarter larger for no benefit
+rl_config.useA85 = 0
+
 class Seal(Flowable):
     """A custom flowable that draws a seal/stamp-like graphic"""
     
@@ -53,14 +60,103 @@ class Seal(Flowable):
 
 def add_watermark(canvas, doc):
     """Add a diagonal watermark across the page"""
+    # Drawn into a form XObject on the first page and only referenced after that
+    form_name = f"Watermark-{doc.pagesize[0]:g}x{doc.pagesize[1]:g}"
+    if not canvas.hasForm(form_name):
+        canvas.beginForm(form_name, 0, 0, doc.pagesize[0], doc.pagesize[1])
+        canvas.setFont("Helvetica", 60)
+        canvas.setFillColor(colors.lightgrey)
+        canvas.translate(doc.pagesize[0]/2, doc.pagesize[1]/2)
+        canvas.rotate(45)
+        canvas.drawCentredString(0, 0, "CONFIDENTIAL")
+        canvas.endForm()
+    # Forms carry no ExtGState resources of their own, so the transparency
+    # is set on the page and inherited by the form
     canvas.saveState()
-    canvas.setFont("Helvetica", 60)
-    canvas.setFillColor(colors.lightgrey.clone(alpha=0.3))
-    canvas.translate(doc.pagesize[0]/2, doc.pagesize[1]/2)
-    canvas.rotate(45)
-    canvas.drawCentredString(0, 0, "CONFIDENTIAL")
+    canvas.setFillAlpha(0.3)
+    canvas.doForm(form_name)
     canvas.restoreState()
 
+class FormTemplate:
+    """
+    Styles shared by every medical assessment report. Built once per process
+    by get_form_template() instead of on every create_form_pdf call.
+    """
+
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+        self.styles.add(ParagraphStyle(
+            name='FormHeading',
+            fontName='Helvetica-Bold',
+            fontSize=18,
+            spaceAfter=16,
+            alignment=1  # Center
+        ))
+        
+        self.styles.add(ParagraphStyle(
+            name='FormSubheading',
+            fontName='Helvetica-Bold',
+            fontSize=14,
+            spaceAfter=16,
+            alignment=1  # Center
+        ))
+        
+        self.styles.add(ParagraphStyle(
+            name='FormField',
+            fontName='Helvetica-Bold',
+            fontSize=10,
+            spaceAfter=8
+        ))
+        
+        self.styles.add(ParagraphStyle(
+            name='FormValue',
+            fontName='Helvetica',
+            fontSize=10,
+            spaceAfter=14,
+            leading=14
+        ))
+        
+        self.styles.add(ParagraphStyle(
+            name='SectionHeading',
+            fontName='Helvetica-Bold',
+            fontSize=12,
+            spaceAfter=10,
+            spaceBefore=15,
+            textColor=colors.darkblue
+        ))
+        
+        self.styles.add(ParagraphStyle(
+            name='Footer',
+            fontName='Helvetica-Oblique',
+            fontSize=8,
+            textColor=colors.gray,
+            alignment=1,  # Center
+            spaceBefore=20
+        ))
+
+        # Header row in dark blue, field names on grey, values on white
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 1), (0, -1), colors.lightgrey),
+            ('BACKGROUND', (1, 1), (1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+        ])
+
+_form_template = None
+
+def get_form_template():
+    """Return the process-wide FormTemplate, building it on first use"""
+    global _form_template
+    if _form_template is None:
+        _form_template = FormTemplate()
+    return _form_template
+
 def create_form_pdf(form_data, output_path=None):
     """
     Create a professional-looking medical assessment PDF with the extracted data.
@@ -85,55 +181,8 @@ def create_form_pdf(form_data, output_path=None):
     )
     
     # Styles
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(
-        name='FormHeading',
-        fontName='Helvetica-Bold',
-        fontSize=18,
-        spaceAfter=16,
-        alignment=1  # Center
-    ))
-    
-    styles.add(ParagraphStyle(
-        name='FormSubheading',
-        fontName='Helvetica-Bold',
-        fontSize=14,
-        spaceAfter=16,
-        alignment=1  # Center
-    ))
-    
-    styles.add(ParagraphStyle(
-        name='FormField',
-        fontName='Helvetica-Bold',
-        fontSize=10,
-        spaceAfter=8
-    ))
-    
-    styles.add(ParagraphStyle(
-        name='FormValue',
-        fontName='Helvetica',
-        fontSize=10,
-        spaceAfter=14,
-        leading=14
-    ))
-    
-    styles.add(ParagraphStyle(
-        name='SectionHeading',
-        fontName='Helvetica-Bold',
-        fontSize=12,
-        spaceAfter=10,
-        spaceBefore=15,
-        textColor=colors.darkblue
-    ))
-    
-    styles.add(ParagraphStyle(
-        name='Footer',
-        fontName='Helvetica-Oblique',
-        fontSize=8,
-        textColor=colors.gray,
-        alignment=1,  # Center
-        spaceBefore=20
-    ))
+    template = get_form_template()
+    styles = template.styles
     
     # Build content
     elements = []
@@ -207,18 +256,7 @@ def create_form_pdf(form_data, output_path=None):
                 ])
             
             table = Table(data, colWidths=[doc.width * 0.4, doc.width * 0.6])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('BACKGROUND', (0, 1), (0, -1), colors.lightgrey),
-                ('BACKGROUND', (1, 1), (1, -1), colors.white),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-            ]))
+            table.setStyle(template.table_style)
             elements.append(table)
             elements.append(Spacer(1, 10))
     
@@ -251,18 +289,7 @@ def create_form_pdf(form_data, output_path=None):
         
         if data:
             table = Table(data, colWidths=[doc.width * 0.4, doc.width * 0.6])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('BACKGROUND', (0, 1), (0, -1), colors.lightgrey),
-                ('BACKGROUND', (1, 1), (1, -1), colors.white),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-            ]))
+            table.setStyle(template.table_style)
             elements.append(table)
     
     elements.append(Spacer(1, 30))
@@ -283,4 +310,109 @@ def create_form_pdf(form_data, output_path=None):
         buffer.seek(0)
         return buffer.getvalue()
     else:
-        return output_path 
\ No newline at end of file
+        return output_path 
+
+# Bump whenever the transcription layout below changes so cached PDFs are re-rendered
+TRANSCRIPTION_TEMPLATE_VERSION = 1
+
+def create_failed_report_pdf(title, error):
+    """
+    Create a one-page placeholder for a report that failed to render, so a
+    merged batch PDF shows the failure where the report would have been.
+
+    Args:
+        title (str): The report's name in the batch
+        error (str): Why the report could not be rendered
+
+    Returns:
+        bytes: The PDF
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = get_form_template().styles
+    doc.build([
+        Paragraph("REPORT NOT AVAILABLE", styles['FormHeading']),
+        Paragraph(escape(title), styles['FormSubheading']),
+        Spacer(1, 0.2*inch),
+        Paragraph("This report could not be rendered:", styles['FormField']),
+        Paragraph(escape(error), styles['FormValue'])
+    ])
+    return buffer.getvalue()
+
+def create_transcription_pdf(transcription_id, title, source_type, metadata, transcription, created_at, output_path):
+    """
+    Render a saved transcription as a PDF.
+
+    Args:
+        transcription_id (str): ID shown in the document header
+        title (str): Document title
+        source_type (str): Where the transcription came from
+        metadata (dict): Extra key/value pairs listed under "Metadata"
+        transcription (str): The transcript text, paragraphs separated by blank lines
+        created_at (float): Save time as a Unix timestamp
+        output_path (str): Path to write the PDF to
+
+    Returns:
+        str: output_path
+    """
+    doc = SimpleDocTemplate(output_path, pagesize=letter)
+    styles = getSampleStyleSheet()
+
+    # Create custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12
+    )
+
+    normal_style = ParagraphStyle(
+        'CustomNormal',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=8
+    )
+
+    # Build the content
+    content = []
+
+    # Add title
+    content.append(Paragraph(title, title_style))
+    content.append(Spacer(1, 0.2*inch))
+
+    # Add metadata
+    content.append(Paragraph(f"ID: {transcription_id}", normal_style))
+    content.append(Paragraph(f"Date: {time.ctime(created_at)}", normal_style))
+    content.append(Paragraph(f"Source: {source_type}", normal_style))
+
+    # Add any additional metadata
+    if metadata:
+        content.append(Spacer(1, 0.2*inch))
+        content.append(Paragraph("Metadata", heading_style))
+        for key, value in metadata.items():
+            content.append(Paragraph(f"<b>{key}</b>: {value}", normal_style))
+
+    # Add the transcription
+    content.append(Spacer(1, 0.3*inch))
+    content.append(Paragraph("Transcription", heading_style))
+
+    # Split transcription into paragraphs and add them
+    paragraphs = transcription.split('\n\n')
+    for para in paragraphs:
+        if para.strip():
+            content.append(Paragraph(para, normal_style))
+
+    # Add footer
+    content.append(Spacer(1, 0.5*inch))
+    content.append(Paragraph(f"Generated on {time.ctime()}", normal_style))
+
+    # Build the PDF
+    doc.build(content)
+    return output_path
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Callable
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pool limits, overridable from the environment
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(os.cpu_count() or 2)))
+PDF_RENDER_MAX_QUEUE = int(os.getenv("PDF_RENDER_MAX_QUEUE", "32"))
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "60"))
+
+
+class PDFRenderQueueFull(Exception):
+    """Raised when the pool already holds as many renders as it is allowed to queue"""
+
+
+class PDFRenderTimeout(Exception):
+    """Raised when a render runs past the per-render timeout once a worker has taken it"""
+
+
+class PDFRenderPool:
+    """
+    Bounded process pool for CPU-bound ReportLab rendering, so layout work
+    runs on every core and never blocks the event loop.
+
+    render() takes a top-level function from pdf_generator plus its arguments;
+    both must be picklable. Renders wait in the queue until a worker is free,
+    and the timeout only starts once one takes them. A render that times out
+    is abandoned by the caller but its worker process still finishes it before
+    taking new work, and it counts toward the queue limit until then.
+    """
+
+    def __init__(self, workers: int = PDF_RENDER_WORKERS, max_queue: int = PDF_RENDER_MAX_QUEUE,
+                 timeout: float = PDF_RENDER_TIMEOUT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        # One slot per worker; a render holds its slot until its worker is done
+        self._slots = None
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._rejected = 0
+        # Keep only the most recent render durations for the stats endpoint
+        self._durations = deque(maxlen=100)
+
+    async def render(self, fn: Callable, *args, timeout: float = None):
+        """Run fn(*args) in a worker process and return its result"""
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise PDFRenderQueueFull(f"PDF render queue is full ({self._in_flight} renders in flight)")
+            self._in_flight += 1
+
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+
+        render_timeout = timeout or self.timeout
+        started = time.time()
+        try:
+            pool_future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                self._in_flight -= 1
+                self._failed += 1
+            raise
+        # A render the caller stopped waiting for (timeout or cancellation) keeps
+        # its worker busy, so it only frees its slot and leaves the count once
+        # it really finishes
+        pool_future.add_done_callback(lambda _: self._render_finished(loop))
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(pool_future), render_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            raise PDFRenderTimeout(f"PDF render exceeded {render_timeout:g}s timeout")
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+
+        with self._lock:
+            self._completed += 1
+            self._durations.append(time.time() - started)
+        return result
+
+    def _render_finished(self, loop: asyncio.AbstractEventLoop):
+        # Runs on the executor's management thread
+        with self._lock:
+            self._in_flight -= 1
+        try:
+            loop.call_soon_threadsafe(self._slots.release)
+        except RuntimeError:
+            # The event loop is already closed (shutdown)
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        durations = list(self._durations)
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "render_timeout": self.timeout,
+            "in_flight": self._in_flight,
+            "queue_length": max(self._in_flight - self.workers, 0),
+            "completed": self._completed,
+            "failed": self._failed,
+            "timed_out": self._timed_out,
+            "rejected": self._rejected,
+            "avg_render_time": round(sum(durations) / len(durations), 3) if durations else None,
+            "max_render_time": round(max(durations), 3) if durations else None,
+        }
+
+
+# Shared pool for all routes in this process
+pdf_render_pool = PDFRenderPool()
@@ -0,0 +1,242 @@
+import asyncio
+import io
+import os
+import re
+import zipfile
+from collections import deque
+from typing import Dict, Any, List, Tuple, AsyncIterator, Optional
+from dotenv import load_dotenv
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject,
+    StreamObject, create_string_object
+)
+from pdf_generator import create_form_pdf
+from pdf_renderer import pdf_render_pool, PDFRenderQueueFull
+
+load_dotenv()
+
+# Largest batch accepted in one request, and how many of its reports may be
+# rendering or waiting to be sent at once. The window is what keeps memory
+# flat: a report is only rendered once an earlier one has been streamed out.
+BATCH_MAX_REPORTS = int(os.getenv("BATCH_MAX_REPORTS", "1000"))
+BATCH_RENDER_WINDOW = int(os.getenv("BATCH_RENDER_WINDOW", str(pdf_render_pool.workers * 2)))
+BATCH_QUEUE_FULL_RETRY_DELAY = 0.25
+
+
+def report_filename(index: int, name: Optional[str] = None) -> str:
+    """Numbered, filesystem-safe file name for the index-th report of a batch"""
+    stem = re.sub(r"[^\w.-]+", "_", name).strip("._") if name else ""
+    return f"{index + 1:04d}_{stem or 'report'}.pdf"
+
+
+async def _render_report(form_data: Dict[str, Any]) -> bytes:
+    # A batch shares the render pool with interactive requests, so wait for
+    # room instead of failing the whole batch when the pool is busy
+    while True:
+        try:
+            return await pdf_render_pool.render(create_form_pdf, form_data)
+        except PDFRenderQueueFull:
+            await asyncio.sleep(BATCH_QUEUE_FULL_RETRY_DELAY)
+
+
+async def render_reports(forms: List[Dict[str, Any]],
+                         window: int = BATCH_RENDER_WINDOW) -> AsyncIterator[Tuple[int, Optional[bytes], Optional[str]]]:
+    """
+    Render form reports in parallel and yield (index, pdf_bytes, error) in
+    input order. At most `window` reports are rendered ahead of the consumer.
+    """
+    pending = deque()
+    next_index = 0
+    try:
+        while pending or next_index < len(forms):
+            while next_index < len(forms) and len(pending) < max(window, 1):
+                pending.append((next_index, asyncio.ensure_future(_render_report(forms[next_index]))))
+                next_index += 1
+
+            index, task = pending.popleft()
+            try:
+                yield index, await task, None
+            except Exception as e:
+                print(f"Batch report {index} failed: {str(e)}")
+                yield index, None, str(e)
+    finally:
+        # The client went away or the consumer failed; drop queued renders
+        for _, task in pending:
+            task.cancel()
+
+
+class _ChunkBuffer:
+    """Write-only file object whose contents are drained after every entry"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_zip(entries: AsyncIterator[Tuple[str, bytes]]) -> AsyncIterator[bytes]:
+    """
+    Build a ZIP archive from (name, data) pairs and yield it piece by piece.
+    The output is not seekable, so zipfile writes data descriptors after each
+    entry instead of going back to patch the local headers.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        async for name, data in entries:
+            archive.writestr(name, data)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+class StreamingPDFMerger:
+    """
+    Concatenate PDFs into one document written front to back.
+
+    Each added document's pages and everything they reference are renumbered
+    and emitted immediately; only object offsets and bookmarks are kept until
+    finish() writes the page tree, outline, catalog and cross-reference table.
+    """
+
+    # Object 1 is reserved for the page tree so pages can point at their parent
+    _PAGES_ID = 1
+
+    def __init__(self):
+        self._offsets: Dict[int, int] = {}
+        self._next_id = self._PAGES_ID + 1
+        self._position = 0
+        self._page_ids: List[int] = []
+        self._bookmarks: List[Tuple[str, int]] = []
+
+    def _reserve(self) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _serialize(self, object_id: int, obj) -> bytes:
+        stream = io.BytesIO()
+        stream.write(f"{object_id} 0 obj\n".encode("ascii"))
+        obj.write_to_stream(stream, None)
+        stream.write(b"\nendobj\n")
+        data = stream.getvalue()
+        self._offsets[object_id] = self._position
+        self._position += len(data)
+        return data
+
+    def header(self) -> bytes:
+        data = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self._position += len(data)
+        return data
+
+    def add_document(self, pdf_bytes: bytes, title: str) -> bytes:
+        """Append every page of pdf_bytes, bookmarked under title"""
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        id_map: Dict[int, int] = {}
+        queue = deque()
+
+        def remap(value):
+            if isinstance(value, IndirectObject):
+                if value.idnum not in id_map:
+                    id_map[value.idnum] = self._reserve()
+                    queue.append(value)
+                return IndirectObject(id_map[value.idnum], 0, None)
+            if isinstance(value, StreamObject):
+                copy = value.__class__()
+                copy._data = value._data
+                for key, item in value.items():
+                    copy[NameObject(key)] = remap(item)
+                return copy
+            if isinstance(value, DictionaryObject):
+                return DictionaryObject({NameObject(key): remap(item) for key, item in value.items()})
+            if isinstance(value, ArrayObject):
+                return ArrayObject(remap(item) for item in value)
+            return value
+
+        # Number the pages up front so links between them are not copied twice
+        pages = list(reader.pages)
+        for page in pages:
+            id_map[page.indirect_reference.idnum] = self._reserve()
+
+        chunks = []
+        for page in pages:
+            page_id = id_map[page.indirect_reference.idnum]
+            copy = DictionaryObject({
+                NameObject(key): remap(item) for key, item in page.items() if key != "/Parent"
+            })
+            copy[NameObject("/Parent")] = IndirectObject(self._PAGES_ID, 0, None)
+            chunks.append(self._serialize(page_id, copy))
+            self._page_ids.append(page_id)
+
+        # Fonts, content streams and XObjects reachable from the pages
+        while queue:
+            source = queue.popleft()
+            chunks.append(self._serialize(id_map[source.idnum], remap(source.get_object())))
+
+        if pages:
+            self._bookmarks.append((title, id_map[pages[0].indirect_reference.idnum]))
+        return b"".join(chunks)
+
+    def finish(self) -> bytes:
+        chunks = [self._serialize(self._PAGES_ID, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(IndirectObject(i, 0, None) for i in self._page_ids),
+            NameObject("/Count"): NumberObject(len(self._page_ids)),
+        }))]
+
+        catalog = DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(self._PAGES_ID, 0, None),
+        })
+        if self._bookmarks:
+            outline_id = self._reserve()
+            item_ids = [self._reserve() for _ in self._bookmarks]
+            for i, (title, page_id) in enumerate(self._bookmarks):
+                item = DictionaryObject({
+                    NameObject("/Title"): create_string_object(title),
+                    NameObject("/Parent"): IndirectObject(outline_id, 0, None),
+                    NameObject("/Dest"): ArrayObject([IndirectObject(page_id, 0, None), NameObject("/Fit")]),
+                })
+                if i > 0:
+                    item[NameObject("/Prev")] = IndirectObject(item_ids[i - 1], 0, None)
+                if i < len(item_ids) - 1:
+                    item[NameObject("/Next")] = IndirectObject(item_ids[i + 1], 0, None)
+                chunks.append(self._serialize(item_ids[i], item))
+            chunks.append(self._serialize(outline_id, DictionaryObject({
+                NameObject("/Type"): NameObject("/Outlines"),
+                NameObject("/First"): IndirectObject(item_ids[0], 0, None),
+                NameObject("/Last"): IndirectObject(item_ids[-1], 0, None),
+                NameObject("/Count"): NumberObject(len(item_ids)),
+            })))
+            catalog[NameObject("/Outlines")] = IndirectObject(outline_id, 0, None)
+            catalog[NameObject("/PageMode")] = NameObject("/UseOutlines")
+
+        catalog_id = self._reserve()
+        chunks.append(self._serialize(catalog_id, catalog))
+
+        xref_offset = self._position
+        xref = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        for object_id in range(1, self._next_id):
+            xref.append(f"{self._offsets[object_id]:010d} 00000 n \n")
+        xref.append(f"trailer\n<< /Size {self._next_id} /Root {catalog_id} 0 R >>\n")
+        xref.append(f"startxref\n{xref_offset}\n%%EOF\n")
+        chunks.append("".join(xref).encode("ascii"))
+        return b"".join(chunks)
+
+
+async def stream_merged_pdf(entries: AsyncIterator[Tuple[str, bytes]]) -> AsyncIterator[bytes]:
+    """Merge (title, pdf_bytes) pairs into one bookmarked PDF, yielded piece by piece"""
+    merger = StreamingPDFMerger()
+    yield merger.header()
+    async for title, data in entries:
+        yield merger.add_document(data, title)
+    yield merger.finish()
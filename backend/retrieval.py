@@ -0,0 +1,138 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores import SimpleVectorStore
+
+
+class FederatedRetriever(BaseRetriever):
+    """
+    Retrieve from several vector indexes at once and keep the best-scoring
+    nodes across all of them.
+
+    The query is embedded once and the same embedding is sent to every index
+    concurrently, so a query costs about as much as the slowest index rather
+    than the sum. All indexes must have been embedded with embed_model for
+    their scores to be comparable.
+    """
+
+    def __init__(self, indexes: Dict[str, VectorStoreIndex], embed_model: BaseEmbedding,
+                 similarity_top_k: int = 5):
+        self._retrievers = {
+            input_path_id: index.as_retriever(similarity_top_k=similarity_top_k)
+            for input_path_id, index in indexes.items()
+        }
+        self._embed_model = embed_model
+        self._similarity_top_k = similarity_top_k
+        super().__init__()
+
+    def _merge(self, results: List[List[NodeWithScore]]) -> List[NodeWithScore]:
+        nodes = [node for result in results for node in result]
+        nodes.sort(key=lambda node: node.score or 0.0, reverse=True)
+        return nodes[:self._similarity_top_k]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self._embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+        with ThreadPoolExecutor(max_workers=len(self._retrievers) or 1) as executor:
+            results = list(executor.map(lambda r: r.retrieve(query_bundle), self._retrievers.values()))
+        return self._merge(results)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = await self._embed_model.aget_agg_embedding_from_queries(
+                query_bundle.embedding_strs
+            )
+        results = await asyncio.gather(*(r.aretrieve(query_bundle) for r in self._retrievers.values()))
+        return self._merge(results)
+
+
+# Normalized vector matrices of in-memory indexes, reused for as long as the
+# index object itself is alive (the index cache keeps hot ones around)
+_index_matrices = weakref.WeakKeyDictionary()
+
+
+def _index_matrix(index: VectorStoreIndex):
+    """Node ids and unit-length float32 vectors of a SimpleVectorStore index"""
+    store = index.vector_store
+    if not isinstance(store, SimpleVectorStore):
+        raise ValueError(f"Bulk search needs an in-memory vector store, not {type(store).__name__}")
+    embedding_dict = store.data.embedding_dict
+    cached = _index_matrices.get(index)
+    if cached is not None and cached[0] == len(embedding_dict):
+        return cached[1:]
+
+    node_ids = list(embedding_dict.keys())
+    matrix = np.array([embedding_dict[node_id] for node_id in node_ids], dtype=np.float32)
+    if len(node_ids):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+    _index_matrices[index] = (len(embedding_dict), node_ids, matrix)
+    return node_ids, matrix
+
+
+class BulkVectorSearch:
+    """
+    Cosine top-k search for many query embeddings at once, computed locally
+    as one matrix product against the vectors of in-memory indexes.
+
+    Gives the same nodes as querying each index's retriever one query at a
+    time, including the input_path_id metadata filter when one is given.
+    """
+
+    def __init__(self, indexes: Dict[str, VectorStoreIndex], input_path_ids: Optional[List[str]] = None):
+        self._owners = []
+        node_ids, matrices = [], []
+        for index in indexes.values():
+            ids, matrix = _index_matrix(index)
+            if input_path_ids is not None:
+                metadata = index.vector_store.data.metadata_dict
+                if ids and not metadata:
+                    raise ValueError("Cannot filter stores that were persisted without metadata")
+                keep = [i for i, node_id in enumerate(ids)
+                        if metadata.get(node_id, {}).get("input_path_id") in input_path_ids]
+                ids, matrix = [ids[i] for i in keep], matrix[keep]
+            if not ids:
+                continue
+            node_ids.extend(ids)
+            matrices.append(matrix)
+            self._owners.extend([index] * len(ids))
+        self._node_ids = node_ids
+        self._matrix = np.vstack(matrices) if node_ids else None
+
+    def search(self, query_embeddings: List[List[float]], similarity_top_k: int = 5) -> List[List[NodeWithScore]]:
+        """Return the top-k nodes for every query embedding, best first"""
+        if self._matrix is None or not query_embeddings:
+            return [[] for _ in query_embeddings]
+
+        queries = np.array(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1, norms)
+        scores = queries @ self._matrix.T
+
+        k = min(similarity_top_k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(queries))[:, None]
+        top = np.take_along_axis(top, np.argsort(-scores[rows, top], axis=1), axis=1)
+
+        # Fetch every node needed by any query once, grouped by owning index
+        needed = {}
+        for position in np.unique(top):
+            index = self._owners[position]
+            needed.setdefault(id(index), (index, []))[1].append(position)
+        nodes = {}
+        for index, positions in needed.values():
+            vector_ids = [self._node_ids[p] for p in positions]
+            node_ids = [index.index_struct.nodes_dict.get(v, v) for v in vector_ids]
+            for position, node in zip(positions, index.docstore.get_nodes(node_ids)):
+                nodes[position] = node
+
+        return [
+            [NodeWithScore(node=nodes[p], score=float(scores[row, p])) for p in top[row]]
+            for row in range(len(queries))
+        ]
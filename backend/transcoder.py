@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pool limits, overridable from the environment
+FFMPEG_MAX_WORKERS = int(os.getenv("FFMPEG_MAX_WORKERS", "2"))
+FFMPEG_MAX_QUEUE = int(os.getenv("FFMPEG_MAX_QUEUE", "8"))
+FFMPEG_JOB_TIMEOUT = float(os.getenv("FFMPEG_JOB_TIMEOUT", "300"))
+
+
+class TranscodeQueueFull(Exception):
+    """Raised when the pool already holds as many jobs as it is allowed to queue"""
+
+
+class TranscodeTimeout(Exception):
+    """Raised when a single ffmpeg job runs past the per-job timeout"""
+
+
+class TranscodePool:
+    """
+    Bounded pool that runs ffmpeg commands on worker threads so the event loop
+    keeps serving other requests while a video encodes.
+    """
+
+    def __init__(self, max_workers: int = FFMPEG_MAX_WORKERS, max_queue: int = FFMPEG_MAX_QUEUE,
+                 timeout: float = FFMPEG_JOB_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ffmpeg")
+        # Counters are touched from both the event loop and worker threads
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._rejected = 0
+        # Keep only the most recent encode durations for the stats endpoint
+        self._durations = deque(maxlen=100)
+
+    def _execute(self, cmd: List[str], timeout: float, **kwargs) -> subprocess.CompletedProcess:
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+        started = time.time()
+        try:
+            return subprocess.run(cmd, capture_output=True, timeout=timeout, **kwargs)
+        finally:
+            with self._lock:
+                self._durations.append(time.time() - started)
+                self._running -= 1
+
+    async def run(self, cmd: List[str], timeout: float = None, **kwargs) -> subprocess.CompletedProcess:
+        """
+        Run a command on the pool and wait for it without blocking the event loop.
+        Extra keyword arguments are passed through to subprocess.run.
+        """
+        with self._lock:
+            if self._pending + self._running >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise TranscodeQueueFull(
+                    f"Transcode queue is full ({self._pending} waiting, {self._running} running)"
+                )
+            self._pending += 1
+
+        loop = asyncio.get_running_loop()
+        job_timeout = timeout or self.timeout
+        try:
+            process = await loop.run_in_executor(
+                self._executor, lambda: self._execute(cmd, job_timeout, **kwargs)
+            )
+        except subprocess.TimeoutExpired:
+            with self._lock:
+                self._timed_out += 1
+            raise TranscodeTimeout(f"ffmpeg job exceeded {job_timeout:.0f}s timeout")
+
+        with self._lock:
+            if process.returncode == 0:
+                self._completed += 1
+            else:
+                self._failed += 1
+        return process
+
+    def stats(self) -> Dict[str, Any]:
+        durations = list(self._durations)
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "job_timeout": self.timeout,
+            "queue_length": self._pending,
+            "running": self._running,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timed_out": self._timed_out,
+            "rejected": self._rejected,
+            "recent_encode_times": [round(d, 2) for d in durations[-10:]],
+            "avg_encode_time": round(sum(durations) / len(durations), 2) if durations else None,
+            "max_encode_time": round(max(durations), 2) if durations else None,
+        }
+
+
+# Shared pool for all routes in this process
+transcode_pool = TranscodePool()
+
+
+FFPROBE_TIMEOUT = float(os.getenv("FFPROBE_TIMEOUT", "30"))
+
+# Codecs that can be stream-copied into an MP4 container unchanged
+MP4_VIDEO_CODECS = {"h264"}
+MP4_AUDIO_CODECS = {"aac", "mp3"}
+
+
+async def probe_media(path: str, pool: TranscodePool = None) -> Dict[str, Any]:
+    """
+    Inspect a media file with ffprobe and return its first video and audio streams.
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_streams',
+        '-show_format',
+        '-of', 'json',
+        path
+    ]
+    process = await (pool or transcode_pool).run(cmd, timeout=FFPROBE_TIMEOUT, text=True)
+    if process.returncode != 0:
+        return {"ok": False, "video": None, "audio": None, "format": {}, "errors": process.stderr.strip()}
+
+    try:
+        data = json.loads(process.stdout or "{}")
+    except json.JSONDecodeError as e:
+        return {"ok": False, "video": None, "audio": None, "format": {}, "errors": str(e)}
+
+    streams = data.get("streams", [])
+    return {
+        "ok": True,
+        "video": next((s for s in streams if s.get("codec_type") == "video"), None),
+        "audio": next((s for s in streams if s.get("codec_type") == "audio"), None),
+        "format": data.get("format", {}),
+        "errors": process.stderr.strip()
+    }
+
+
+def _video_stream_usable(stream: Dict[str, Any]) -> bool:
+    return bool(
+        stream
+        and stream.get("codec_name")
+        and int(stream.get("width") or 0) > 0
+        and int(stream.get("height") or 0) > 0
+    )
+
+
+def choose_conversion_path(probe: Dict[str, Any]) -> str:
+    """
+    Pick the cheapest way to turn a probed upload into an MP4 Gemini accepts:
+    - "copy": both streams already fit MP4, remux without re-encoding
+    - "copy_video": keep the video stream, re-encode only the audio
+    - "audio_only": the video stream is missing or broken, extract the audio
+    - "transcode": full libx264 + AAC encode
+    """
+    if not probe["ok"]:
+        return "transcode"
+
+    video, audio = probe["video"], probe["audio"]
+    if not _video_stream_usable(video):
+        return "audio_only" if audio else "transcode"
+
+    if video.get("codec_name") in MP4_VIDEO_CODECS:
+        if audio is None or audio.get("codec_name") in MP4_AUDIO_CODECS:
+            return "copy"
+        return "copy_video"
+
+    return "transcode"
+
+
+async def detect_silences(path: str, noise: str = "-35dB", min_duration: float = 0.4,
+                          pool: TranscodePool = None) -> List[Tuple[float, float]]:
+    """
+    Find silent stretches in a file's audio with ffmpeg's silencedetect filter.
+    Returns (start, end) pairs in seconds.
+    """
+    cmd = [
+        'ffmpeg',
+        '-i', path,
+        '-vn',
+        '-af', f'silencedetect=noise={noise}:d={min_duration}',
+        '-f', 'null',
+        '-'
+    ]
+    process = await (pool or transcode_pool).run(cmd, text=True)
+    if process.returncode != 0:
+        return []
+
+    starts = [float(m) for m in re.findall(r"silence_start: (-?[\d.]+)", process.stderr)]
+    ends = [float(m) for m in re.findall(r"silence_end: ([\d.]+)", process.stderr)]
+    return list(zip(starts, ends))
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache")
+os.makedirs(cache_dir, exist_ok=True)
+
+# Entries older than the TTL are ignored and purged; the least recently used
+# entries are dropped once the cache holds more than MAX_ENTRIES
+TRANSCRIPTION_CACHE_TTL = float(os.getenv("TRANSCRIPTION_CACHE_TTL", str(7 * 24 * 3600)))
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "10000"))
+
+
+def make_cache_key(media_hash: str, model: str, prompt: str, mode: str = "") -> str:
+    """
+    Key a transcript by the uploaded media and everything that shapes the
+    model output, including the transcription mode (modes can share a prompt)
+    """
+    return hashlib.sha256(f"{media_hash}:{model}:{mode}:{prompt}".encode("utf-8")).hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Persistent SQLite cache of transcripts keyed by content hash. Long-mode
+    transcripts also keep their per-segment results as JSON.
+    """
+
+    def __init__(self, db_path: str = os.path.join(cache_dir, "transcriptions.db"),
+                 ttl: float = TRANSCRIPTION_CACHE_TTL, max_entries: int = TRANSCRIPTION_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    cache_key TEXT PRIMARY KEY,
+                    upload_id TEXT NOT NULL,
+                    transcript TEXT NOT NULL,
+                    transcription_mode TEXT,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    segments TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_accessed ON transcripts(last_accessed)")
+            # Caches created before long-mode segments were stored lack the column
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(transcripts)")}
+            if "segments" not in columns:
+                conn.execute("ALTER TABLE transcripts ADD COLUMN segments TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT upload_id, transcript, transcription_mode, created_at, segments "
+                "FROM transcripts WHERE cache_key = ?",
+                (cache_key,)
+            ).fetchone()
+
+            if row is None or now - row[3] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM transcripts WHERE cache_key = ?", (cache_key,))
+                    self._evictions += 1
+                self._misses += 1
+                return None
+
+            conn.execute("UPDATE transcripts SET last_accessed = ? WHERE cache_key = ?", (now, cache_key))
+            self._hits += 1
+            return {
+                "upload_id": row[0],
+                "transcript": row[1],
+                "transcription_mode": row[2],
+                "created_at": row[3],
+                "segments": json.loads(row[4]) if row[4] else None
+            }
+
+    def put(self, cache_key: str, upload_id: str, transcript: str, transcription_mode: str = None,
+            segments: List[Dict[str, Any]] = None):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts "
+                "(cache_key, upload_id, transcript, transcription_mode, created_at, last_accessed, size, segments) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, upload_id, transcript, transcription_mode, now, now, len(transcript.encode("utf-8")),
+                 json.dumps(segments) if segments is not None else None)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        expired = conn.execute("DELETE FROM transcripts WHERE created_at < ?", (now - self.ttl,)).rowcount
+        overflow = conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                """
+                DELETE FROM transcripts WHERE cache_key IN (
+                    SELECT cache_key FROM transcripts ORDER BY last_accessed ASC LIMIT ?
+                )
+                """,
+                (overflow,)
+            )
+        self._evictions += expired + max(overflow, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock, self._connect() as conn:
+            entries, total_size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+            ).fetchone()
+        lookups = self._hits + self._misses
+        return {
+            "entries": entries,
+            "total_bytes": total_size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else None
+        }
+
+
+transcription_cache = TranscriptionCache()
@@ -0,0 +1,62 @@
+import os
+import uuid
+from typing import Dict, Any, Optional
+from pdf_generator import create_transcription_pdf, TRANSCRIPTION_TEMPLATE_VERSION
+from pdf_renderer import pdf_render_pool
+from transcription_store import transcription_store, store_dir
+
+# Rendered transcription PDFs live next to the store as <id>.pdf
+transcriptions_dir = store_dir
+
+
+def transcription_pdf_path(transcription_id: str) -> str:
+    return os.path.join(transcriptions_dir, f"{transcription_id}.pdf")
+
+
+def transcription_id_from_filename(filename: str) -> str:
+    """Turn an ID, file name or path of a transcription PDF into its ID"""
+    name = os.path.basename(filename)
+    return name[:-4] if name.lower().endswith(".pdf") else name
+
+
+async def ensure_transcription_pdf(stored: Dict[str, Any], file_path: str):
+    """
+    Render a stored transcription to file_path unless the cached PDF there
+    was already rendered from the same template and content.
+    """
+    pdf_version = f"{TRANSCRIPTION_TEMPLATE_VERSION}:{stored['content_hash']}"
+    if stored["pdf_version"] == pdf_version and os.path.exists(file_path):
+        return
+
+    # Render next to the target and swap it in so readers never see a partial file
+    temp_path = f"{file_path}.{uuid.uuid4().hex[:6]}.tmp"
+    try:
+        await pdf_render_pool.render(
+            create_transcription_pdf,
+            stored["id"], stored["title"], stored["source_type"], stored["metadata"],
+            stored["transcript"], stored["created_at"], temp_path
+        )
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    transcription_store.set_pdf_version(stored["id"], pdf_version)
+
+
+async def resolve_transcription_path(path: str) -> Optional[str]:
+    """
+    If path names a saved transcription (its ID, or the file name or path of
+    its PDF), make sure the PDF is rendered and return its path. Returns None
+    for anything else.
+    """
+    directory = os.path.dirname(path)
+    if directory and os.path.abspath(directory) != os.path.abspath(transcriptions_dir):
+        return None
+    transcription_id = transcription_id_from_filename(path)
+    file_path = transcription_pdf_path(transcription_id)
+    stored = transcription_store.get(transcription_id)
+    if stored and stored["transcript"] is not None:
+        await ensure_transcription_pdf(stored, file_path)
+        return file_path
+    # Legacy transcriptions only exist as PDFs
+    return file_path if os.path.exists(file_path) else None
@@ -0,0 +1,275 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+store_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "transcriptions")
+os.makedirs(store_dir, exist_ok=True)
+
+
+def _encode_cursor(created_at: float, transcription_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, transcription_id]).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        created_at, transcription_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(created_at), str(transcription_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# Control characters that cannot appear in transcripts mark matches in snippets
+_HIGHLIGHT_START = "\x02"
+_HIGHLIGHT_END = "\x03"
+
+
+def _split_highlights(marked: str) -> Tuple[str, List[List[int]]]:
+    """Strip highlight markers from a snippet and return it with the match offsets"""
+    text, highlights, start = [], [], None
+    position = 0
+    for char in marked:
+        if char == _HIGHLIGHT_START:
+            start = position
+        elif char == _HIGHLIGHT_END:
+            if start is not None:
+                highlights.append([start, position])
+            start = None
+        else:
+            text.append(char)
+            position += 1
+    return "".join(text), highlights
+
+
+class TranscriptionStore:
+    """
+    SQLite store of saved transcriptions, so their text, title and metadata can
+    be read back without opening the generated PDFs.
+
+    Rows with a NULL transcript are legacy transcriptions that only exist as a
+    PDF; their text still has to be extracted from the file. For all other rows
+    the PDF is only a rendering, cached on disk and tagged with pdf_version.
+    """
+
+    def __init__(self, db_path: str = os.path.join(store_dir, "transcriptions.db")):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS transcriptions (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    source_type TEXT NOT NULL,
+                    transcript TEXT,
+                    metadata TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    content_hash TEXT,
+                    pdf_version TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_transcriptions_created ON transcriptions(created_at, id)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transcriptions_source_created "
+                "ON transcriptions(source_type, created_at, id)"
+            )
+            # Stores created before PDFs were rendered lazily lack the version columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(transcriptions)")}
+            for column in ("content_hash", "pdf_version"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE transcriptions ADD COLUMN {column} TEXT")
+
+            # Full-text index over titles and transcripts, kept in step with every save.
+            # FTS rows share the rowid of their transcription so saves and searches
+            # can reach them by rowid instead of scanning the index (nothing here
+            # runs VACUUM, which could renumber the implicit rowids).
+            fts_columns = {row[1] for row in conn.execute("PRAGMA table_info(transcriptions_fts)")}
+            if "id" in fts_columns:
+                # Earlier stores keyed the index by an unindexed id column
+                conn.execute("DROP TABLE transcriptions_fts")
+                fts_columns = set()
+            if not fts_columns:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE transcriptions_fts USING fts5("
+                    "title, transcript, tokenize = 'porter unicode61')"
+                )
+                conn.execute(
+                    "INSERT INTO transcriptions_fts (rowid, title, transcript) "
+                    "SELECT rowid, title, transcript FROM transcriptions WHERE transcript IS NOT NULL"
+                )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        item = dict(row)
+        if "metadata" in item:
+            item["metadata"] = json.loads(item["metadata"])
+        return item
+
+    def save(self, transcription_id: str, title: str, source_type: str, transcript: str,
+             metadata: Dict[str, Any] = None, created_at: float = None):
+        now = time.time()
+        created_at = created_at or now
+        metadata_json = json.dumps(metadata or {}, default=str)
+        # Changes whenever anything shown in the rendered PDF changes
+        content_hash = hashlib.sha256(
+            json.dumps([title, source_type, transcript, metadata_json, created_at]).encode("utf-8")
+        ).hexdigest()
+        with self._lock, self._connect() as conn:
+            previous = conn.execute("SELECT rowid FROM transcriptions WHERE id = ?", (transcription_id,)).fetchone()
+            if previous:
+                conn.execute("DELETE FROM transcriptions_fts WHERE rowid = ?", (previous[0],))
+            cursor = conn.execute(
+                "INSERT OR REPLACE INTO transcriptions "
+                "(id, title, source_type, transcript, metadata, created_at, updated_at, content_hash, pdf_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+                (transcription_id, title, source_type, transcript, metadata_json, created_at, now, content_hash)
+            )
+            if transcript is not None:
+                conn.execute(
+                    "INSERT INTO transcriptions_fts (rowid, title, transcript) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, title, transcript)
+                )
+
+    def set_pdf_version(self, transcription_id: str, pdf_version: str):
+        """Record which template/content version the cached PDF was rendered from"""
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE transcriptions SET pdf_version = ? WHERE id = ?", (pdf_version, transcription_id))
+
+    def get(self, transcription_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM transcriptions WHERE id = ?", (transcription_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit: int = 100, cursor: str = None, order: str = "desc",
+             source_type: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Page through transcriptions by creation date using keyset pagination.
+        Returns the page and a cursor for the next one (None on the last page).
+        has_pdf tells whether a PDF has been rendered (legacy rows always have one).
+        """
+        descending = order != "asc"
+        clauses, params = [], []
+        if source_type:
+            clauses.append("source_type = ?")
+            params.append(source_type)
+        if cursor:
+            created_at, transcription_id = _decode_cursor(cursor)
+            clauses.append(f"(created_at, id) {'<' if descending else '>'} (?, ?)")
+            params.extend([created_at, transcription_id])
+
+        direction = "DESC" if descending else "ASC"
+        query = (
+            "SELECT id, title, source_type, created_at, "
+            "(transcript IS NULL OR pdf_version IS NOT NULL) AS has_pdf FROM transcriptions"
+        )
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += f" ORDER BY created_at {direction}, id {direction} LIMIT ?"
+        params.append(limit + 1)
+
+        with self._connect() as conn:
+            rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return rows, next_cursor
+
+    def search(self, query: str, limit: int = 20, offset: int = 0,
+               source_type: str = None) -> List[Dict[str, Any]]:
+        """
+        Rank transcriptions matching every word in query with BM25, title
+        matches weighted above transcript matches. Each result carries a
+        snippet of the transcript and the [start, end) character offsets of
+        the matched words inside that snippet.
+        """
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+        # Quote each word so user input can never be parsed as FTS5 syntax
+        match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+        # Rank and cut the page on the index alone, then build snippets and
+        # join the stored rows for just that page
+        ranked = (
+            "SELECT transcriptions_fts.rowid AS rowid, bm25(transcriptions_fts, 5.0, 1.0) AS score "
+            "FROM transcriptions_fts"
+        )
+        if source_type:
+            ranked += " CROSS JOIN transcriptions ON transcriptions.rowid = transcriptions_fts.rowid"
+        ranked += " WHERE transcriptions_fts MATCH ?"
+        params: List[Any] = [match]
+        if source_type:
+            ranked += " AND transcriptions.source_type = ?"
+            params.append(source_type)
+        ranked += " ORDER BY score LIMIT ? OFFSET ?"
+        params.extend([limit, offset, match])
+
+        sql = (
+            "SELECT t.id, t.title, t.source_type, t.created_at, "
+            f"snippet(transcriptions_fts, 1, '{_HIGHLIGHT_START}', '{_HIGHLIGHT_END}', '...', 24) AS snippet, "
+            "ranked.score "
+            f"FROM ({ranked}) AS ranked "
+            "CROSS JOIN transcriptions_fts ON transcriptions_fts.rowid = ranked.rowid "
+            "CROSS JOIN transcriptions t ON t.rowid = ranked.rowid "
+            "WHERE transcriptions_fts MATCH ? "
+            "ORDER BY ranked.score"
+        )
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        results = []
+        for row in rows:
+            item = dict(row)
+            item["snippet"], item["highlights"] = _split_highlights(item["snippet"] or "")
+            # bm25 is lower-is-better; flip it so higher means more relevant
+            item["score"] = round(-item["score"], 4)
+            results.append(item)
+        return results
+
+    def backfill_legacy(self, pdf_dir: str) -> int:
+        """
+        Register PDFs saved before this store existed, keyed by file name,
+        so listings can come from the store alone. Returns how many were added.
+        """
+        with self._connect() as conn:
+            known = {row[0] for row in conn.execute("SELECT id FROM transcriptions")}
+
+        added = 0
+        for filename in os.listdir(pdf_dir):
+            transcription_id = filename[:-4]
+            if not filename.endswith(".pdf") or transcription_id in known:
+                continue
+            created_at = os.path.getctime(os.path.join(pdf_dir, filename))
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO transcriptions "
+                    "(id, title, source_type, transcript, metadata, created_at, updated_at) "
+                    "VALUES (?, ?, 'unknown', NULL, '{}', ?, ?)",
+                    (transcription_id, f"Transcription {transcription_id}", created_at, created_at)
+                )
+            added += 1
+        return added
+
+
+transcription_store = TranscriptionStore()
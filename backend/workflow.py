@@ -1,13 +1,18 @@
 import os, json
+import asyncio
+from typing import List, Union
 from llama_parse import LlamaParse
 from llama_index.llms.gemini import Gemini
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.core import (
+    Document,
     VectorStoreIndex,
     StorageContext,
     load_index_from_storage,
 )
 from llama_index.core.vector_stores.types import MetadataFilters, MetadataFilter
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.schema import QueryBundle
 
 from llama_index.core.workflow import (
     StartEvent,
@@ -18,6 +23,11 @@ from llama_index.core.workflow import (
     Context
 )
 from helper import get_openai_api_key, get_llama_cloud_api_key, get_google_api_key
+from index_cache import index_cache
+from retrieval import FederatedRetriever, BulkVectorSearch
+from parse_cache import parse_cache, file_sha256, make_parse_cache_key
+from form_schemas import form_schema_registry, SOURCE_EXTRACTED
+from embedding_cache import CachedEmbedding
 
 import nest_asyncio
 
@@ -26,6 +36,70 @@ llama_cloud_api_key = get_llama_cloud_api_key()
 openai_api_key = get_openai_api_key()
 google_api_key = get_google_api_key()
 
+# Every index is embedded with this model, so queries must use it too
+EMBED_MODEL_NAME = "text-embedding-3-small"
+
+def get_embed_model():
+    # Vectors for texts and queries seen before come from the on-disk cache
+    return CachedEmbedding(OpenAIEmbedding(model_name=EMBED_MODEL_NAME))
+
+# LlamaParse settings for each kind of document; they are part of the parse cache key
+INPUT_PARSER_SETTINGS = {
+    "result_type": "text",
+    "content_guideline_instruction": "This is a medical information form, gather related facts together and format it as bullet points with headers"
+}
+FORM_PARSER_SETTINGS = {
+    "result_type": "text",
+    "content_guideline_instruction": "This is a medical information form. Create a list of all the fields that need to be filled in.",
+    "system_prompt": "Return a bulleted list of the fields ONLY."
+}
+FIELDS_PARSER_SETTINGS = {
+    "result_type": "text",
+    "content_guideline_instruction": "This is a medical information form, gather related facts together and format it as bullet points with headers",
+    "system_prompt": "Return a bulleted list of the fields ONLY."
+}
+
+def _llama_parser(parser_settings):
+    return LlamaParse(
+        api_key=llama_cloud_api_key,
+        base_url=os.getenv("LLAMA_CLOUD_BASE_URL"),
+        **parser_settings
+    )
+
+def parse_documents(file_path, parser_settings):
+    """
+    Parse a file with LlamaParse, reusing the stored result when the same
+    content was already parsed with the same settings.
+    """
+    cache_key = make_parse_cache_key(file_sha256(file_path), parser_settings)
+    cached = parse_cache.get(cache_key)
+    if cached is not None:
+        return [Document.from_dict(doc) for doc in cached]
+
+    documents = _llama_parser(parser_settings).load_data(file_path)
+    parse_cache.put(cache_key, [doc.to_dict() for doc in documents])
+    return documents
+
+async def aparse_documents(file_path, parser_settings):
+    """Async version of parse_documents, used inside the workflow"""
+    cache_key = make_parse_cache_key(file_sha256(file_path), parser_settings)
+    cached = parse_cache.get(cache_key)
+    if cached is not None:
+        return [Document.from_dict(doc) for doc in cached]
+
+    documents = await _llama_parser(parser_settings).aload_data(file_path)
+    parse_cache.put(cache_key, [doc.to_dict() for doc in documents])
+    return documents
+
+def load_stored_index(input_path_id, storage_dir):
+    """Load a persisted index, reusing the copy cached in this process if it is current"""
+    index = index_cache.get(input_path_id, storage_dir)
+    if index is None:
+        storage_context = StorageContext.from_defaults(persist_dir=storage_dir)
+        index = load_index_from_storage(storage_context, embed_model=get_embed_model())
+        index_cache.put(input_path_id, storage_dir, index)
+    return index
+
 class ParseFormEvent(Event):
   document_path: str
 
@@ -33,13 +107,66 @@ class QueryEvent(Event):
   query: str
   field: str
 
+class QueryBatchEvent(Event):
+    fields: List[str]
+    queries: List[str]
+
 class ResponseEvent(Event):
     field: str
     response: str
 
+# Fields answered per LLM call; 1 keeps one query per field
+FIELD_BATCH_SIZE = int(os.getenv("FIELD_BATCH_SIZE", "1"))
+# Chunks retrieved per field query
+SIMILARITY_TOP_K = 5
+# Most field queries (or batches) in flight per workflow run
+FIELD_QUERY_CONCURRENCY = int(os.getenv("FIELD_QUERY_CONCURRENCY", "8"))
+
+# Phrases the LLM uses when the documents don't answer a question
+NO_INFORMATION_PHRASES = (
+    "not contain",
+    "no information",
+    "does not mention",
+    "doesn't mention",
+    "not available",
+    "not provided",
+    "cannot find",
+    "unable to find",
+    "doesn't provide",
+    "does not provide",
+)
+
+def is_no_information(text):
+    text = text.lower()
+    return any(phrase in text for phrase in NO_INFORMATION_PHRASES)
+
+def strip_code_fence(text):
+    """Remove the markdown code block the LLM sometimes wraps JSON in"""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+def normalize_field_name(field):
+    """Field name as matched against LLM answer keys: case and whitespace are ignored"""
+    return " ".join(str(field).split()).casefold()
+
 class RAGWorkflow(Workflow):
     
     base_storage_dir = "./storage"
+
+    def __init__(self, *args, query_concurrency: int = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Field queries run as concurrent steps; this caps them for this workflow,
+        # up to FIELD_QUERY_CONCURRENCY workers per step
+        self.query_concurrency = min(query_concurrency or FIELD_QUERY_CONCURRENCY, FIELD_QUERY_CONCURRENCY)
+        self._query_semaphore = asyncio.Semaphore(self.query_concurrency)
+        # Nodes for every field query, found in one bulk search by parse_form
+        self._prefetched_nodes = {}
     llm: Gemini
     query_engine: VectorStoreIndex
 
@@ -58,10 +185,12 @@ class RAGWorkflow(Workflow):
         
         # Store input filter IDs for use in querying
         await ctx.set("input_filter_ids", input_filter_ids)
+        await ctx.set("field_batch_size", getattr(ev, "field_batch_size", None) or FIELD_BATCH_SIZE)
         
         # Create storage directory for this specific visa document
         self.storage_dir = os.path.join(self.base_storage_dir, input_path_id)
 
+        self.embed_model = get_embed_model()
         self.llm = Gemini(
             model="models/gemini-1.5-flash",
             api_key=google_api_key,
@@ -69,16 +198,12 @@ class RAGWorkflow(Workflow):
         )
 
         if os.path.exists(self.storage_dir) and use_existing_index:
-            storage_context = StorageContext.from_defaults(persist_dir=self.storage_dir)
-            index = load_index_from_storage(storage_context)
+            index = load_stored_index(input_path_id, self.storage_dir)
         else:
+            index_cache.invalidate(input_path_id)
+
             # parse and load the input document
-            documents = LlamaParse(
-                api_key=llama_cloud_api_key,
-                base_url=os.getenv("LLAMA_CLOUD_BASE_URL"),
-                result_type="text",
-                content_guideline_instruction="This is a medical information form, gather related facts together and format it as bullet points with headers"
-            ).load_data(ev.input_path)
+            documents = await aparse_documents(ev.input_path, INPUT_PARSER_SETTINGS)
 
             # Add metadata to documents
             for doc in documents:
@@ -89,59 +214,67 @@ class RAGWorkflow(Workflow):
             # Embed and index the documents
             index = VectorStoreIndex.from_documents(
                 documents,
-                embed_model=OpenAIEmbedding(model_name="text-embedding-3-small")
+                embed_model=self.embed_model
             )
             # Save the index
             os.makedirs(self.storage_dir, exist_ok=True)
             index.storage_context.persist(persist_dir=self.storage_dir)
+            index_cache.put(input_path_id, self.storage_dir, index)
 
         # Create a query engine with filters based on input_filter_ids
-        if input_filter_ids and len(input_filter_ids) > 0:
-            # Create proper MetadataFilters object
-            if len(input_filter_ids) == 1:
-                # Single filter for just one input ID
-                metadata_filter = MetadataFilter(
-                    key="input_path_id", 
-                    value=input_filter_ids[0]
-                )
-                metadata_filters = MetadataFilters(filters=[metadata_filter])
-            else:
-                # Multiple filters for multiple input IDs
-                filters = []
-                for vid in input_filter_ids:
-                    filters.append(MetadataFilter(
-                        key="input_path_id", 
-                        value=vid
-                    ))
-                metadata_filters = MetadataFilters(
-                    filters=filters,
-                    condition="or"  # Match any of the input IDs
-                )
+        if input_filter_ids and (len(input_filter_ids) > 1 or input_filter_ids[0] != input_path_id):
+            # Each input document has its own index, so search all of them at once
+            self.query_engine = await self._federated_query_engine(input_path_id, index, input_filter_ids)
+            self.search_filter_ids = None
+        elif input_filter_ids:
+            # Single filter for just one input ID
+            metadata_filter = MetadataFilter(
+                key="input_path_id", 
+                value=input_filter_ids[0]
+            )
+            metadata_filters = MetadataFilters(filters=[metadata_filter])
                 
             self.query_engine = index.as_query_engine(
                 llm=self.llm, 
-                similarity_top_k=5,
+                similarity_top_k=SIMILARITY_TOP_K,
                 filters=metadata_filters
             )
+            self.search_indexes = {input_path_id: index}
+            self.search_filter_ids = [input_filter_ids[0]]
         else:
             # Use all documents if no filter specified
-            self.query_engine = index.as_query_engine(llm=self.llm, similarity_top_k=5)
+            self.query_engine = index.as_query_engine(llm=self.llm, similarity_top_k=SIMILARITY_TOP_K)
+            self.search_indexes = {input_path_id: index}
+            self.search_filter_ids = None
             
         return ParseFormEvent(document_path=ev.document_path)
 
-    @step
-    async def parse_form(self, ctx: Context, ev: ParseFormEvent) -> QueryEvent:
-        parser = LlamaParse(
-            api_key=llama_cloud_api_key,
-            base_url=os.getenv("LLAMA_CLOUD_BASE_URL"),
-            result_type="text",
-            content_guideline_instruction="This is a medical information form. Create a list of all the fields that need to be filled in.",
-            system_prompt="Return a bulleted list of the fields ONLY."
-        )
+    async def _federated_query_engine(self, input_path_id, index, input_filter_ids):
+        indexes = {input_path_id: index} if input_path_id in input_filter_ids else {}
+        other_ids = [i for i in dict.fromkeys(input_filter_ids) if i not in indexes]
 
+        # Load the other indexes concurrently; ids without a stored index are skipped
+        stored_ids = [i for i in other_ids if os.path.exists(os.path.join(self.base_storage_dir, i))]
+        loaded = await asyncio.gather(*(
+            asyncio.to_thread(load_stored_index, stored_id, os.path.join(self.base_storage_dir, stored_id))
+            for stored_id in stored_ids
+        ))
+        indexes.update(zip(stored_ids, loaded))
+        missing = [i for i in input_filter_ids if i not in indexes]
+        if missing:
+            print(f"No stored index for input document(s): {', '.join(missing)}")
+        if not indexes:
+            raise ValueError("None of the requested input documents have an index")
+
+        self.search_indexes = indexes
+        retriever = FederatedRetriever(indexes, embed_model=self.embed_model, similarity_top_k=SIMILARITY_TOP_K)
+        return RetrieverQueryEngine.from_args(retriever, llm=self.llm)
+
+    async def _extract_form_fields(self, document_path):
+        """Parse a blank form and have the LLM list the fields to fill in"""
         # Get the LLM to convert the parsed form into JSON
-        result = parser.load_data(ev.document_path)[0]
-        raw_json = self.llm.complete(
+        result = (await aparse_documents(document_path, FORM_PARSER_SETTINGS))[0]
+        raw_json = await self.llm.acomplete(
             f"""
             This is a parsed form. 
             Convert it into a JSON object containing only the list 
@@ -151,17 +284,7 @@ class RAGWorkflow(Workflow):
             """)
         
         # Clean the response text to ensure it's valid JSON
-        json_text = raw_json.text.strip()
-        
-        # Remove any markdown code block indicators if present
-        if json_text.startswith("```json"):
-            json_text = json_text[7:]
-        if json_text.startswith("```"):
-            json_text = json_text[3:]
-        if json_text.endswith("```"):
-            json_text = json_text[:-3]
-        
-        json_text = json_text.strip()
+        json_text = strip_code_fence(raw_json.text)
         
         try:
             json_data = json.loads(json_text)
@@ -186,44 +309,87 @@ class RAGWorkflow(Workflow):
             else:
                 raise ValueError(f"Failed to parse JSON: {e}")
 
-        for field in fields:
-            ctx.send_event(QueryEvent(
-                field=field,
-                query=f"How would you answer this question about the candidate? {field}"
-            ))
+        return fields
+
+    async def _prefetch_nodes(self, texts):
+        """Embed all retrieval queries in one batch and find their nodes with one local search"""
+        self._prefetched_nodes = {}
+        try:
+            search = BulkVectorSearch(self.search_indexes, self.search_filter_ids)
+            unique_texts = list(dict.fromkeys(texts))
+            # text-embedding-3 models embed queries and documents the same way
+            embeddings = await self.embed_model.aget_text_embedding_batch(unique_texts)
+            self._prefetched_nodes = dict(zip(unique_texts, search.search(embeddings, SIMILARITY_TOP_K)))
+        except Exception as e:
+            print(f"Bulk retrieval unavailable, retrieving per field: {str(e)}")
+
+    @staticmethod
+    def _field_prompt(input_filter_ids, query):
+        input_context = "the input documents" if len(input_filter_ids) > 1 else "the specific input document"
+        return f"""This is a question about {input_context} we have in our database: {query}
+                    If you cannot find the specific information in the documents, just return an empty string.
+                    Do NOT reply with phrases like 'The provided text does not contain...' or 'No information found...'
+                    Instead, return a string with just a single space character."""
+
+    @step
+    async def parse_form(self, ctx: Context, ev: ParseFormEvent) -> Union[QueryEvent, QueryBatchEvent]:
+        # Forms seen before, or registered by an operator, skip parsing and extraction
+        form_hash = file_sha256(ev.document_path)
+        schema = form_schema_registry.lookup(form_hash)
+        if schema is not None:
+            fields = schema["fields"]
+            print(f"Using {schema['source']} schema with {len(fields)} fields for form {form_hash[:12]}")
+        else:
+            fields = await self._extract_form_fields(ev.document_path)
+            # An empty extraction is most likely a failed one; retry it next time
+            if fields:
+                form_schema_registry.register(
+                    form_hash, fields, source=SOURCE_EXTRACTED, name=os.path.basename(ev.document_path)
+                )
+            else:
+                print(f"No fields extracted from form {form_hash[:12]}; not caching its schema")
+
+        queries = [f"How would you answer this question about the candidate? {field}" for field in fields]
+        batch_size = await ctx.get("field_batch_size")
+
+        # Retrieve for every field up front: one embedding call, one local search
+        if batch_size > 1:
+            await self._prefetch_nodes(queries)
+        else:
+            input_filter_ids = await ctx.get("input_filter_ids")
+            await self._prefetch_nodes([self._field_prompt(input_filter_ids, query) for query in queries])
+
+        if batch_size > 1:
+            # Consecutive fields usually belong to the same section of the form
+            for i in range(0, len(fields), batch_size):
+                ctx.send_event(QueryBatchEvent(
+                    fields=fields[i:i + batch_size],
+                    queries=queries[i:i + batch_size]
+                ))
+        else:
+            for field, query in zip(fields, queries):
+                ctx.send_event(QueryEvent(field=field, query=query))
 
         # Store the number of fields so we know how many to wait for later
         await ctx.set("total_fields", len(fields))
         return
 
-    @step
+    @step(num_workers=FIELD_QUERY_CONCURRENCY)
     async def ask_question(self, ctx: Context, ev: QueryEvent) -> ResponseEvent:
         # Get the input_filter_ids to use in the prompt
         input_filter_ids = await ctx.get("input_filter_ids")
-        input_context = "the input documents" if len(input_filter_ids) > 1 else "the specific input document"
+        prompt = self._field_prompt(input_filter_ids, ev.query)
         
         try:
-            response = self.query_engine.query(
-                f"""This is a question about {input_context} we have in our database: {ev.query}
-                If you cannot find the specific information in the documents, just return an empty string.
-                Do NOT reply with phrases like 'The provided text does not contain...' or 'No information found...'
-                Instead, return a string with just a single space character."""
-            )
+            async with self._query_semaphore:
+                nodes = self._prefetched_nodes.get(prompt)
+                if nodes is not None:
+                    response = await self.query_engine.asynthesize(QueryBundle(prompt), nodes)
+                else:
+                    response = await self.query_engine.aquery(prompt)
             
             # Check if the response contains negative phrases indicating no information was found
-            response_text = response.response.lower()
-            if (
-                "not contain" in response_text or
-                "no information" in response_text or
-                "does not mention" in response_text or
-                "doesn't mention" in response_text or
-                "not available" in response_text or
-                "not provided" in response_text or
-                "cannot find" in response_text or
-                "unable to find" in response_text or
-                "doesn't provide" in response_text or
-                "does not provide" in response_text
-            ):
+            if is_no_information(response.response):
                 # Return a zero-width space (invisible character) if no information was found
                 return ResponseEvent(field=ev.field, response="\u200B")
             
@@ -233,6 +399,70 @@ class RAGWorkflow(Workflow):
             # Return zero-width space on error
             return ResponseEvent(field=ev.field, response="\u200B")
 
+    async def _retrieve_prefetched(self, query):
+        nodes = self._prefetched_nodes.get(query)
+        if nodes is None:
+            nodes = await self.query_engine.retriever.aretrieve(query)
+        return nodes
+
+    async def _answer_batch(self, fields, queries, input_context):
+        # Union of the chunks retrieved for every field, best score first
+        retrieved = await asyncio.gather(*(
+            self._retrieve_prefetched(query) for query in queries
+        ))
+        nodes = {}
+        for node in (node for result in retrieved for node in result):
+            known = nodes.get(node.node.node_id)
+            if known is None or (node.score or 0.0) > (known.score or 0.0):
+                nodes[node.node.node_id] = node
+        context = "\n\n".join(
+            node.node.get_content()
+            for node in sorted(nodes.values(), key=lambda n: n.score or 0.0, reverse=True)
+        )
+        questions = "\n".join(f"- {field}: {query}" for field, query in zip(fields, queries))
+
+        result = await self.llm.acomplete(f"""
+            Answer each of the following questions about {input_context} using only the context below.
+            Return a JSON object that maps every field name, exactly as written before the colon,
+            to its answer. Return JSON ONLY, no markdown.
+            If the context does not contain the answer to a question, use a string with just a single space character.
+            Do NOT reply with phrases like 'The provided text does not contain...' or 'No information found...'
+
+            <context>
+            {context}
+            </context>
+
+            <questions>
+            {questions}
+            </questions>
+        """)
+        answers = json.loads(strip_code_fence(result.text))
+        if not isinstance(answers, dict):
+            raise ValueError("Expected a JSON object of answers")
+        # The LLM does not always echo field names exactly as written
+        return {normalize_field_name(field): answer for field, answer in answers.items()}
+
+    @step(num_workers=FIELD_QUERY_CONCURRENCY)
+    async def ask_question_batch(self, ctx: Context, ev: QueryBatchEvent) -> ResponseEvent:
+        """Answer a group of fields with one retrieval pass and one LLM call"""
+        input_filter_ids = await ctx.get("input_filter_ids")
+        input_context = "the input documents" if len(input_filter_ids) > 1 else "the specific input document"
+
+        answers = {}
+        try:
+            async with self._query_semaphore:
+                answers = await self._answer_batch(ev.fields, ev.queries, input_context)
+        except Exception as e:
+            print(f"Error querying for fields {ev.fields}: {str(e)}")
+
+        # One ResponseEvent per field, exactly as the per-field step would produce
+        for field in ev.fields:
+            answer = answers.get(normalize_field_name(field))
+            if answer is None or is_no_information(str(answer)):
+                answer = "\u200B"
+            ctx.send_event(ResponseEvent(field=field, response=str(answer)))
+        return None
+
     @step
     async def fill_in_application(self, ctx: Context, ev: ResponseEvent) -> StopEvent:
         # get the total number of fields to wait for
@@ -248,7 +478,7 @@ class RAGWorkflow(Workflow):
 
         input_context = f"using information from input document(s): {', '.join(input_filter_ids)}"
 
-        result = self.llm.complete(f"""
+        result = await self.llm.acomplete(f"""
             You are given a list of fields in an application form and responses to
             questions about those fields from {input_context}. Combine the two into a list of
             fields and succinct, factual answers to fill in those fields.
@@ -265,17 +495,7 @@ class RAGWorkflow(Workflow):
         """)
         
         # Clean the response text to ensure it's valid JSON
-        json_text = result.text.strip()
-        
-        # Remove any markdown code block indicators if present
-        if json_text.startswith("```json"):
-            json_text = json_text[7:]
-        if json_text.startswith("```"):
-            json_text = json_text[3:]
-        if json_text.endswith("```"):
-            json_text = json_text[:-3]
-        
-        json_text = json_text.strip()
+        json_text = strip_code_fence(result.text)
         
         try:
             # Parse the JSON response
@@ -303,14 +523,3 @@ class RAGWorkflow(Workflow):
             print(f"Problematic JSON text: {json_text}")
             # If JSON parsing fails, return the raw text
             return StopEvent(result=result.text)
-
-
-def get_llama_parser():
-  parser = LlamaParse(
-    api_key=llama_cloud_api_key,
-    base_url=os.getenv("LLAMA_CLOUD_BASE_URL"),
-    result_type="text",
-    content_guideline_instruction="This is a medical information form, gather related facts together and format it as bullet points with headers",
-    system_prompt="Return a bulleted list of the fields ONLY."
-  )
-  return parser
\ No newline at end of file
@@ -65,7 +65,7 @@ interface Transcription {
   id: string;
   title: string;
   date: string;
-  file_path: string;
+  file_path: string | null;
   selected: boolean;
 }
 
@@ -164,7 +164,7 @@ export default function Dashboard() {
               id: string;
               title?: string;
               date?: string;
-              file_path: string;
+              file_path: string | null;
             }) => ({
               id: trans.id,
               title: trans.title || "Untitled Transcription",
@@ -239,8 +239,9 @@ export default function Dashboard() {
 
   const handleViewTranscript = async (transcription: Transcription) => {
     try {
-      // Get the full file path
-      const filePath = transcription.file_path;
+      // Get the full file path; the PDF of a new transcription may not be
+      // rendered yet, and the backend also accepts the transcription ID
+      const filePath = transcription.file_path || transcription.id;
 
       if (!filePath) {
         throw new Error("Invalid file path");
@@ -295,7 +296,7 @@ export default function Dashboard() {
 
       // Prepare the request body for the process-form endpoint
       const requestBody = {
-        input_path: selectedTranscription.file_path,
+        input_path: selectedTranscription.file_path || selectedTranscription.id,
         input_path_id: selectedTranscription.id,
         document_path: selectedDocument.path || "",
         use_existing_index: true,